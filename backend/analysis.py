@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+from filters import resize_for_filters
+from filter_store import apply_filters_cached
+import segmentation
+import classification
+
+# ==============================
+# SINGLE-PASS ANALYSIS
+# ==============================
+# Decodes an upload once and derives the 512 (filters), 256 (segmentation)
+# and 224 (classification) inputs from the same array, instead of each
+# endpoint re-reading and re-resizing the file.
+
+_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="analyze")
+
+
+def prepare_variants(img):
+    return {
+        "filters": resize_for_filters(img),
+        "segmentation": segmentation.preprocess(img),
+        "classification": classification.preprocess(img),
+    }
+
+
+STAGES = ("filters", "mask", "classification")
+
+
+def analyze_array(img, image_key, parallel=True, stages=STAGES):
+    """
+    Runs filters, segmentation and classification on one decoded grayscale image.
+    Returns {"filters": {...}, "mask": array or None, "classification": (label, conf)},
+    limited to the requested stages. Filter results are read from and written
+    to the persistent filter store under image_key.
+    """
+    variants = prepare_variants(img)
+    stage_fns = {
+        "filters": lambda: apply_filters_cached(variants["filters"], image_key),
+        "mask": lambda: segmentation.predict_mask(variants["segmentation"], img.shape[:2]),
+        "classification": lambda: classification.predict_label(variants["classification"]),
+    }
+    stage_fns = {name: fn for name, fn in stage_fns.items() if name in stages}
+
+    if not parallel:
+        return {name: stage() for name, stage in stage_fns.items()}
+
+    futures = {name: _executor.submit(stage) for name, stage in stage_fns.items()}
+    return {name: future.result() for name, future in futures.items()}
@@ -1,13 +1,22 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
 import os
-import cv2
-import numpy as np
 import base64
-import uuid
-from filters import apply_all_filters
-from segmentation import segment_image
-from classification import classify_image
+import json
+import mimetypes
+import threading
+from filters import FILTERS, METRIC_NAMES, MAX_DIM, resize_for_filters
+from filter_stages import stage_totals
+from filter_store import filter_store, apply_filters_cached, iter_filters_cached, DEFAULT_JPEG_QUALITY
+from analysis import analyze_array
+import segmentation
+import classification
+from image_cache import image_cache
+from result_cache import result_cache, content_hash, content_key, find_existing_upload
+from model_registry import registry
+from inference_batcher import batchers
+from artifacts import artifact_store
+from jobs import job_queue, QueueFull, QUEUED, RUNNING, SUCCEEDED
 
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*"}}) # Allow all origins for API in production
@@ -17,16 +26,147 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 print(f"Server starting. Upload folder: {UPLOAD_FOLDER}")
 
-# Helper to encode image to base64
-def encode_image(img_path):
-    if not os.path.exists(img_path):
-        return None
-    with open(img_path, "rb") as f:
-        return base64.b64encode(f.read()).decode('utf-8')
+# Helpers to encode images to base64
+def encode_bytes(data):
+    return base64.b64encode(data).decode('utf-8')
 
-def encode_cv2_image(img_array):
-    _, buffer = cv2.imencode('.jpg', img_array)
-    return base64.b64encode(buffer).decode('utf-8')
+# Image transport: "base64" inlines images in the JSON (default, original
+# format); "urls" returns short-lived /api/artifacts URLs to the raw bytes.
+RESPONSE_FORMATS = ("base64", "urls")
+
+# Artifacts published on this thread are also appended to
+# _published.artifacts while a job builder records them (see PublishedResult)
+_published = threading.local()
+
+def artifact_url(data, content_type):
+    recorded = getattr(_published, "artifacts", None)
+    if recorded is not None:
+        recorded.append((data, content_type))
+    return f"/api/artifacts/{artifact_store.publish(data, content_type)}"
+
+def format_filter_result(name, data, fmt="base64"):
+    item = {
+        "name": name,
+        "metrics": data['metrics']
+    }
+    if fmt == "urls":
+        item["image_url"] = artifact_url(data['encoded'], "image/jpeg")
+    else:
+        item["image"] = encode_bytes(data['encoded'])
+    return item
+
+def format_filter_results(results, fmt="base64"):
+    return [format_filter_result(name, data, fmt) for name, data in results.items()]
+
+def format_segmentation(image_id, filepath, mask_bytes, fmt="base64"):
+    if fmt == "urls":
+        mask_type = mimetypes.guess_type(f"mask_{image_id}")[0] or "image/png"
+        return {
+            "original_url": f"/uploads/{image_id}",
+            "mask_url": artifact_url(mask_bytes, mask_type) if mask_bytes is not None else None
+        }
+    return {
+        "original": encode_bytes(image_cache.get_raw(image_id, filepath)),
+        "mask": encode_bytes(mask_bytes) if mask_bytes is not None else None
+    }
+
+# Filter selection: ?filters=, ?metrics= (comma-separated names), ?max_dim=,
+# ?quality= (JPEG) and ?full_res=1 (original size, tiled; max_dim is then
+# ignored). Everything is validated before any filter runs.
+DEFAULT_FILTER_OPTIONS = {
+    "names": tuple(FILTERS),
+    "metrics": METRIC_NAMES,
+    "max_dim": MAX_DIM,
+    "quality": DEFAULT_JPEG_QUALITY,
+    "full_res": False
+}
+
+TRUE_VALUES = ("1", "true", "yes", "on")
+FALSE_VALUES = ("0", "false", "no", "off")
+
+def parse_bool(key, raw):
+    """
+    Parses a boolean query/job parameter. Raises ValueError on anything else.
+    """
+    value = str(raw).strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f"{key} must be one of {', '.join(TRUE_VALUES + FALSE_VALUES)}")
+
+def parse_filter_options(args):
+    """
+    Returns the filter options for this request. Raises ValueError on unknown
+    names or out-of-range values.
+    """
+    def names_arg(key, allowed):
+        raw = args.get(key)
+        if raw is None:
+            return tuple(allowed)
+        names = [n.strip() for n in raw.split(",") if n.strip()]
+        unknown = [n for n in names if n not in allowed]
+        if unknown:
+            raise ValueError(f"Unknown {key}: {', '.join(unknown)}")
+        if not names:
+            raise ValueError(f"No {key} selected")
+        # Canonical order, duplicates dropped
+        return tuple(n for n in allowed if n in names)
+
+    def int_arg(key, default, low, high):
+        raw = args.get(key)
+        if raw is None:
+            return default
+        try:
+            value = int(raw)
+        except ValueError:
+            raise ValueError(f"{key} must be an integer")
+        if not low <= value <= high:
+            raise ValueError(f"{key} must be between {low} and {high}")
+        return value
+
+    def bool_arg(key, default):
+        raw = args.get(key)
+        return default if raw is None else parse_bool(key, raw)
+
+    return {
+        "names": names_arg("filters", FILTERS),
+        "metrics": names_arg("metrics", METRIC_NAMES),
+        "max_dim": int_arg("max_dim", MAX_DIM, 16, MAX_DIM),
+        "quality": int_arg("quality", DEFAULT_JPEG_QUALITY, 1, 100),
+        "full_res": bool_arg("full_res", False)
+    }
+
+# Results are cached by content hash, so re-uploads of the same image reuse them
+def filters_cache_key(image_id, options):
+    return ("filters", content_key(image_id)) + tuple(options.values())
+
+def store_filters(image_id, results, options=DEFAULT_FILTER_OPTIONS):
+    size = sum(len(d["encoded"]) for d in results.values())
+    result_cache.put(filters_cache_key(image_id, options), results, size)
+
+def compute_filters(image_id, img, options, stream=False):
+    if not options["full_res"]:
+        img = resize_for_filters(img, options["max_dim"])
+    args = (img, content_key(image_id), options["names"], options["metrics"],
+            options["quality"], options["full_res"])
+    return iter_filters_cached(*args) if stream else apply_filters_cached(*args)
+
+def cached_filters(image_id, img, options=DEFAULT_FILTER_OPTIONS):
+    results = result_cache.get(filters_cache_key(image_id, options))
+    if results is None:
+        results = compute_filters(image_id, img, options)
+        store_filters(image_id, results, options)
+    return results
+
+def store_mask(image_id, filepath, mask):
+    _, mask_bytes = segmentation.save_mask(filepath, mask)
+    result_cache.put(("mask", content_key(image_id)), mask_bytes, len(mask_bytes))
+    return mask_bytes
+
+def store_classification(image_id, label, confidence):
+    if label != "Unknown":
+        result_cache.put(("classification", content_key(image_id)), (label, confidence), 64)
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -38,6 +178,19 @@ def health_check():
         "env": os.environ.get('RAILWAY_ENVIRONMENT', 'unknown')
     })
 
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    return jsonify({
+        "models": registry.stats(),
+        "images": image_cache.stats(),
+        "results": result_cache.stats(),
+        "filter_store": filter_store.stats(),
+        "filter_stages": stage_totals(),
+        "artifacts": artifact_store.stats(),
+        "jobs": job_queue.stats(),
+        "batching": {name: b.stats() for name, b in batchers.items()}
+    })
+
 @app.route('/api/upload', methods=['POST'])
 def upload_image():
     print("Received upload request")
@@ -50,74 +203,331 @@ def upload_image():
         print("Error: Empty filename")
         return jsonify({"error": "No selected file"}), 400
     
-    # Save file with unique ID
-    ext = os.path.splitext(file.filename)[1]
-    filename = f"{uuid.uuid4()}{ext}"
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(filepath)
+    # Name the file after its content so identical uploads share one ID
+    data = file.read()
+    digest = content_hash(data)
+    filename = find_existing_upload(UPLOAD_FOLDER, digest)
+    duplicate = filename is not None
+    if not duplicate:
+        ext = os.path.splitext(file.filename)[1].lower()
+        filename = f"{digest}{ext}"
+        with open(os.path.join(UPLOAD_FOLDER, filename), "wb") as f:
+            f.write(data)
+    # Later steps read the upload from memory instead of disk
+    image_cache.put_raw(filename, data)
     
     return jsonify({
         "message": "Image uploaded successfully",
         "id": filename,
+        "duplicate": duplicate,
         "url": f"/uploads/{filename}",
-        "base64": encode_image(filepath) # Send back preview
+        "base64": encode_bytes(data) # Send back preview
     })
 
-@app.route('/api/filters/<image_id>', methods=['GET'])
-def get_filters(image_id):
+STREAM_MIMETYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream"
+}
+
+def stream_filters(image_id, img, fmt, image_fmt="base64", options=DEFAULT_FILTER_OPTIONS):
+    """
+    Emits each filter result as soon as it is ready, one NDJSON line or SSE
+    event per filter, followed by a final "done" message.
+    """
+    def frame(event, payload):
+        body = json.dumps(payload, default=float)
+        if fmt == "sse":
+            return f"event: {event}\ndata: {body}\n\n"
+        return body + "\n"
+
+    def generate():
+        cached = result_cache.get(filters_cache_key(image_id, options))
+        try:
+            if cached is not None:
+                items = iter(cached.items())
+            else:
+                items = compute_filters(image_id, img, options, stream=True)
+            for name, data in items:
+                yield frame("filter", format_filter_result(name, data, image_fmt))
+        except Exception as e:
+            # Headers are already sent; report the failure in-band
+            yield frame("error", {"error": str(e)})
+            return
+        yield frame("done", {"done": True})
+
+    return Response(stream_with_context(generate()), mimetype=STREAM_MIMETYPES[fmt], headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+# ==============================
+# RESPONSE BUILDERS
+# ==============================
+# Shared by the synchronous endpoints and by background jobs, so they take
+# plain arguments rather than reading the request.
+
+class ApiError(Exception):
+    def __init__(self, message, status=500):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+@app.errorhandler(ApiError)
+def handle_api_error(e):
+    return jsonify({"error": e.message}), e.status
+
+def load_image(image_id):
     filepath = os.path.join(UPLOAD_FOLDER, image_id)
-    if not os.path.exists(filepath):
-        return jsonify({"error": "Image not found"}), 404
-        
-    # Apply filters
+    img = image_cache.get_gray(image_id, filepath)
+    if img is None:
+        raise ApiError("Image not found", 404)
+    return filepath, img
+
+def checked_format(args):
+    fmt = args.get('format', 'base64')
+    if fmt not in RESPONSE_FORMATS:
+        raise ApiError(f"Unsupported format: {fmt}", 400)
+    return fmt
+
+def checked_bool(args, key, default):
+    raw = args.get(key)
+    if raw is None:
+        return default
+    try:
+        return parse_bool(key, raw)
+    except ValueError as e:
+        raise ApiError(str(e), 400)
+
+def checked_filter_options(args):
     try:
-        results = apply_all_filters(filepath)
+        return parse_filter_options(args)
+    except ValueError as e:
+        raise ApiError(str(e), 400)
+
+def filters_payload(image_id, img, options=DEFAULT_FILTER_OPTIONS, fmt="base64"):
+    return format_filter_results(cached_filters(image_id, img, options), fmt)
+
+def segmentation_payload(image_id, filepath, img, fmt="base64"):
+    mask_bytes = result_cache.get(("mask", content_key(image_id)))
+    if mask_bytes is None:
+        mask = segmentation.predict_mask(segmentation.preprocess(img), img.shape[:2])
+        if mask is None:
+            raise ApiError("Segmentation failed", 500)
+        mask_bytes = store_mask(image_id, filepath, mask)
+    return format_segmentation(image_id, filepath, mask_bytes, fmt)
+
+def classification_payload(image_id, img):
+    cached = result_cache.get(("classification", content_key(image_id)))
+    if cached is None:
+        label, confidence = classification.predict_label(classification.preprocess(img))
+        store_classification(image_id, label, confidence)
+    else:
+        label, confidence = cached
+    return {
+        "label": label,
+        "confidence": float(confidence)
+    }
+
+def analysis_payload(image_id, filepath, img, parallel=True, fmt="base64"):
+    key = content_key(image_id)
+    filters_data = result_cache.get(filters_cache_key(image_id, DEFAULT_FILTER_OPTIONS))
+    mask_bytes = result_cache.get(("mask", key))
+    cached_label = result_cache.get(("classification", key))
+    missing = [name for name, value in (("filters", filters_data), ("mask", mask_bytes),
+                                        ("classification", cached_label)) if value is None]
+
+    results = analyze_array(img, key, parallel=parallel, stages=missing) if missing else {}
+    if "filters" in results:
+        filters_data = results["filters"]
+        store_filters(image_id, filters_data)
+    if results.get("mask") is not None:
+        mask_bytes = store_mask(image_id, filepath, results["mask"])
+    if "classification" in results:
+        label, confidence = results["classification"]
+        store_classification(image_id, label, confidence)
+    else:
+        label, confidence = cached_label
+
+    return {
+        "filters": format_filter_results(filters_data, fmt),
+        "segmentation": format_segmentation(image_id, filepath, mask_bytes, fmt),
+        "classification": {
+            "label": label,
+            "confidence": float(confidence)
+        }
+    }
+
+def run_payload(build):
+    try:
+        return jsonify(build())
+    except ApiError:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    
-    # Format response
-    response_data = []
-    for name, data in results.items():
-        response_data.append({
-            "name": name,
-            "metrics": data['metrics'],
-            "image": encode_cv2_image(data['image'])
-        })
+
+# ==============================
+# SYNCHRONOUS ENDPOINTS
+# ==============================
+@app.route('/api/filters', methods=['GET'])
+def list_filters():
+    # Filter catalog from the registry, in result order
+    return jsonify([spec.to_dict() for spec in FILTERS.values()])
+
+@app.route('/api/filters/<image_id>', methods=['GET'])
+def get_filters(image_id):
+    _, img = load_image(image_id)
+    fmt = checked_format(request.args)
+    options = checked_filter_options(request.args)
+
+    # ?stream=ndjson|sse sends each filter as it finishes instead of one array
+    stream = request.args.get('stream')
+    if stream is not None:
+        if stream not in STREAM_MIMETYPES:
+            return jsonify({"error": f"Unsupported stream format: {stream}"}), 400
+        return stream_filters(image_id, img, stream, fmt, options)
         
-    return jsonify(response_data)
+    return run_payload(lambda: filters_payload(image_id, img, options, fmt))
 
 @app.route('/api/segment/<image_id>', methods=['GET'])
 def get_segmentation(image_id):
-    filepath = os.path.join(UPLOAD_FOLDER, image_id)
-    if not os.path.exists(filepath):
-        return jsonify({"error": "Image not found"}), 404
-        
-    try:
-        mask_path = segment_image(filepath)
-        if mask_path is None:
-            return jsonify({"error": "Segmentation failed"}), 500
-            
-        return jsonify({
-            "original": encode_image(filepath),
-            "mask": encode_image(mask_path)
-        })
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    filepath, img = load_image(image_id)
+    fmt = checked_format(request.args)
+    return run_payload(lambda: segmentation_payload(image_id, filepath, img, fmt))
 
 @app.route('/api/classify/<image_id>', methods=['GET'])
 def get_classification(image_id):
-    filepath = os.path.join(UPLOAD_FOLDER, image_id)
-    if not os.path.exists(filepath):
-        return jsonify({"error": "Image not found"}), 404
-        
+    _, img = load_image(image_id)
+    return run_payload(lambda: classification_payload(image_id, img))
+
+@app.route('/api/analyze/<image_id>', methods=['GET'])
+def get_analysis(image_id):
+    # Decode once; every stage works from the same array
+    filepath, img = load_image(image_id)
+    parallel = checked_bool(request.args, 'parallel', True)
+    fmt = checked_format(request.args)
+    return run_payload(lambda: analysis_payload(image_id, filepath, img, parallel, fmt))
+
+# ==============================
+# BACKGROUND JOBS
+# ==============================
+# POST /api/jobs {"kind": "analyze", "image_id": "...", "params": {...}}
+# queues the same work as the matching GET endpoint; params mirror that
+# endpoint's query parameters. Poll /api/jobs/<id> and fetch
+# /api/jobs/<id>/result once it has succeeded.
+
+class PublishedResult:
+    """
+    Result of a urls-format job together with the artifact bytes its URLs
+    point to. Tokens are derived from the bytes, so republishing on every
+    fetch keeps the stored URLs valid for as long as the job is retained,
+    not just for the artifact TTL after the job finished.
+    """
+    def __init__(self, payload, artifacts):
+        self.payload = payload
+        self.artifacts = artifacts
+        # Retained size, for the job queue's result budget
+        self.nbytes = len(json.dumps(payload, default=float)) + sum(len(data) for data, _ in artifacts)
+
+    def republish(self):
+        for data, content_type in self.artifacts:
+            artifact_store.publish(data, content_type)
+        return self.payload
+
+def recording_artifacts(build):
+    def run():
+        _published.artifacts = []
+        try:
+            payload = build()
+            return PublishedResult(payload, _published.artifacts)
+        finally:
+            _published.artifacts = None
+    return run
+
+def job_builder(build, fmt):
+    return recording_artifacts(build) if fmt == "urls" else build
+
+def prepare_job(kind, image_id, params):
+    """
+    Validates a job request up front and returns the callable to run.
+    """
+    filepath, img = load_image(image_id)
+    if kind == "filters":
+        options = checked_filter_options(params)
+        fmt = checked_format(params)
+        return job_builder(lambda: filters_payload(image_id, img, options, fmt), fmt)
+    if kind == "segment":
+        fmt = checked_format(params)
+        return job_builder(lambda: segmentation_payload(image_id, filepath, img, fmt), fmt)
+    if kind == "classify":
+        return lambda: classification_payload(image_id, img)
+    if kind == "analyze":
+        parallel = checked_bool(params, 'parallel', True)
+        fmt = checked_format(params)
+        return job_builder(lambda: analysis_payload(image_id, filepath, img, parallel, fmt), fmt)
+    raise ApiError(f"Unknown job kind: {kind}", 400)
+
+def job_response(job, status=200):
+    body = job.to_dict()
+    body["status_url"] = f"/api/jobs/{job.id}"
+    body["result_url"] = f"/api/jobs/{job.id}/result"
+    return jsonify(body), status
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    body = request.get_json(silent=True) or {}
+    kind = body.get("kind", "analyze")
+    image_id = body.get("image_id")
+    if not image_id:
+        return jsonify({"error": "image_id is required"}), 400
+    params = {k: str(v) for k, v in (body.get("params") or {}).items()}
+
+    fn = prepare_job(kind, image_id, params)
     try:
-        label, confidence = classify_image(filepath)
-        return jsonify({
-            "label": label,
-            "confidence": float(confidence)
-        })
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        job = job_queue.submit(kind, fn)
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 503
+
+    response, status = job_response(job, 202)
+    response.headers["Location"] = f"/api/jobs/{job.id}"
+    return response, status
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return job_response(job)
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job.status == SUCCEEDED:
+        if isinstance(job.result, PublishedResult):
+            return jsonify(job.result.republish())
+        return jsonify(job.result)
+    if job.status in (QUEUED, RUNNING):
+        # Not ready yet: same shape as the status endpoint
+        return job_response(job, 202)
+    return jsonify({"error": job.error or f"Job {job.status}", "status": job.status}), 409
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return job_response(job)
+
+@app.route('/api/artifacts/<token>', methods=['GET'])
+def get_artifact(token):
+    artifact = artifact_store.fetch(token)
+    if artifact is None:
+        return jsonify({"error": "Artifact not found or expired"}), 404
+    data, content_type = artifact
+    return Response(data, mimetype=content_type, headers={
+        "Cache-Control": f"private, max-age={int(artifact_store.ttl_s)}"
+    })
 
 @app.route('/uploads/<path:filename>')
 def serve_uploads(filename):
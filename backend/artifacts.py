@@ -0,0 +1,47 @@
+import os
+import time
+import hashlib
+from image_cache import ByteLRUCache
+
+# ==============================
+# SHORT-LIVED BINARY ARTIFACTS
+# ==============================
+# Encoded images published here are served as raw bytes with their real
+# content type from /api/artifacts/<token>, so responses can carry a URL
+# instead of a base64 copy of the image. Tokens are derived from the bytes,
+# so publishing the same image again just refreshes its expiry. Artifacts
+# live in process memory: with more than one worker, a URL only resolves
+# on the worker that issued it.
+
+DEFAULT_BUDGET_MB = 128
+DEFAULT_TTL_S = 300
+
+
+class ArtifactStore(ByteLRUCache):
+    def __init__(self, budget_bytes, ttl_s):
+        super().__init__(budget_bytes)
+        self.ttl_s = ttl_s
+
+    def publish(self, data, content_type):
+        token = hashlib.sha256(data).hexdigest()[:32]
+        self.put(token, (data, content_type, time.time() + self.ttl_s), len(data))
+        return token
+
+    def fetch(self, token):
+        """
+        Returns (data, content_type) or None if unknown or expired.
+        """
+        entry = self.get(token)
+        if entry is None:
+            return None
+        data, content_type, expires_at = entry
+        if time.time() > expires_at:
+            self.discard(token)
+            return None
+        return data, content_type
+
+
+artifact_store = ArtifactStore(
+    int(float(os.environ.get("ARTIFACT_CACHE_MB", DEFAULT_BUDGET_MB)) * 1024 * 1024),
+    float(os.environ.get("ARTIFACT_TTL_S", DEFAULT_TTL_S)),
+)
@@ -0,0 +1,575 @@
+"""
+Benchmarks for the RetinaLens backend.
+
+Usage:
+    python benchmark.py inference --model segmentation --clients 8 --requests 64
+    python benchmark.py filters --image path/to/fundus.jpg --threads 1 4 8
+    python benchmark.py ace-me --image path/to/fundus.jpg
+    python benchmark.py full-res --max-dim 3000 --tile-size 512
+    python benchmark.py batch --count 32
+    python benchmark.py wavelet --sizes 512 1024 2048
+    python benchmark.py bilateral --sizes 1024 3000 --scales 2 4
+    python benchmark.py metrics --image path/to/fundus.jpg --ssim-steps 1 2 4
+    python benchmark.py masks --sizes 256 512 1024
+"""
+import argparse
+import os
+import threading
+import time
+import numpy as np
+
+# =============================================================================
+# HELPERS
+# =============================================================================
+
+def load_benchmark_image(path, max_dim=512):
+    """
+    Grayscale test image: the given file, or a synthetic fundus-like image.
+    """
+    if path:
+        import cv2
+        img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            raise SystemExit(f"Could not read {path}")
+    else:
+        rng = np.random.default_rng(0)
+        y, x = np.ogrid[:max_dim, :max_dim]
+        dist_sq = (x - max_dim / 2) ** 2 + (y - max_dim / 2) ** 2
+        img = 200 * np.exp(-dist_sq / (2 * (max_dim / 3) ** 2)) + rng.normal(0, 8, (max_dim, max_dim))
+        img = np.clip(img, 0, 255).astype(np.uint8)
+    if max(img.shape) > max_dim:
+        from filters import resize_for_filters
+        img = resize_for_filters(img, max_dim)
+    return img
+
+def time_call(fn, repeat):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+def percentile_ms(samples, q):
+    return float(np.percentile(np.asarray(samples) * 1000.0, q)) if samples else 0.0
+
+def print_table(rows, columns):
+    widths = [max(len(c), *(len(f"{r[c]}") for r in rows)) for c in columns]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for r in rows:
+        print("  ".join(f"{r[c]}".ljust(w) for c, w in zip(columns, widths)))
+
+# =============================================================================
+# INFERENCE: THROUGHPUT VS LATENCY OF MICRO-BATCHING
+# =============================================================================
+
+def _load_inference_model(which):
+    if which == "segmentation":
+        import segmentation
+        model = segmentation.get_model()
+        if model is None:
+            # Weights do not affect timing; fall back to the bare architecture.
+            print("Segmentation weights unavailable, benchmarking untrained Attention U-Net.")
+            model = segmentation.Attention_UNet()
+        return model, (256, 256, 1)
+
+    import classification
+    model = classification.get_model()
+    if model is None:
+        raise SystemExit("Classifier model could not be loaded.")
+    return model, (224, 224, 1)
+
+def _run_clients(batcher, sample, clients, total_requests):
+    latencies = []
+    lock = threading.Lock()
+    per_client = max(1, total_requests // clients)
+
+    def client():
+        for _ in range(per_client):
+            t0 = time.perf_counter()
+            batcher.predict(sample)
+            dt = time.perf_counter() - t0
+            with lock:
+                latencies.append(dt)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, time.perf_counter() - start
+
+def bench_inference(args):
+    from inference_batcher import MicroBatcher
+
+    model, shape = _load_inference_model(args.model)
+    sample = np.random.rand(*shape).astype(np.float32)
+    predict_fn = lambda batch: model.predict(batch, verbose=0)
+
+    # Warm up graph tracing for every batch size we might see.
+    for n in range(1, max(args.batch_sizes) + 1):
+        predict_fn(np.stack([sample] * n))
+
+    configs = [(1, 0.0)] + [(b, w) for b in args.batch_sizes for w in args.windows_ms if b > 1]
+    rows = []
+    for max_batch, window_ms in configs:
+        batcher = MicroBatcher(f"bench-{max_batch}-{window_ms}", predict_fn, max_batch, window_ms)
+        latencies, elapsed = _run_clients(batcher, sample, args.clients, args.requests)
+        stats = batcher.stats()
+        rows.append({
+            "max_batch": max_batch,
+            "window_ms": window_ms,
+            "mean_batch": f"{stats['mean_batch_size']:.2f}",
+            "req/s": f"{len(latencies) / elapsed:.2f}",
+            "p50_ms": f"{percentile_ms(latencies, 50):.1f}",
+            "p95_ms": f"{percentile_ms(latencies, 95):.1f}",
+        })
+
+    print(f"\n{args.model}: {args.clients} concurrent clients, {args.requests} requests per config")
+    print_table(rows, ["max_batch", "window_ms", "mean_batch", "req/s", "p50_ms", "p95_ms"])
+
+# =============================================================================
+# FILTER BANK: SERIAL VS PARALLEL
+# =============================================================================
+
+def bench_filters(args):
+    import filters
+
+    img = load_benchmark_image(args.image, args.max_dim)
+    slowest = max(time_call(lambda n=n: filters.run_filter(n, img), 1) for n in filters.FILTERS)
+
+    rows = []
+    for threads in args.threads:
+        filters.configure_pools(threads, args.processes if threads > 1 else 0)
+        wall = time_call(lambda: filters.apply_filters_to_array(img), args.repeat)
+        rows.append({
+            "threads": threads,
+            "processes": filters.FILTER_PROCESSES,
+            "wall_ms": f"{wall * 1000:.1f}",
+            "slowest_filter_ms": f"{slowest * 1000:.1f}",
+        })
+
+    print(f"\nFilter bank on {img.shape[1]}x{img.shape[0]}, {os.cpu_count()} CPUs")
+    print_table(rows, ["threads", "processes", "wall_ms", "slowest_filter_ms"])
+
+    from filter_stages import StageCache
+    stages = StageCache()
+    filters.apply_filters_to_array(img, stages=stages)
+    report = stages.report()
+    print(f"\nShared stages: {report['computed']} computed, {report['reused']} reuses, "
+          f"{report['saved_ms']:.1f} ms saved per image")
+    stage_rows = [{"stage": k, "compute_ms": f"{v['compute_ms']:.2f}", "reused": v["reused"]}
+                  for k, v in report["stages"].items()]
+    print_table(stage_rows, ["stage", "compute_ms", "reused"])
+
+# =============================================================================
+# ACE-ME: FUSED VS REFERENCE
+# =============================================================================
+
+def peak_alloc_bytes(fn):
+    """
+    Peak bytes allocated by one call of fn (numpy and OpenCV output arrays
+    are both allocated through numpy, so tracemalloc sees them).
+    """
+    import tracemalloc
+    fn()  # warm-up, so per-thread buffers already exist
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def bench_ace_me(args):
+    import filter_test
+    from filter_stages import StageCache
+
+    img = load_benchmark_image(args.image, args.max_dim)
+    # Share the bilateral stage so only the ACE-ME body is measured.
+    stages = StageCache()
+    filter_test.filter_bilateral(img, stages)
+
+    reference = filter_test.filter_ace_me_reference(img, stages)
+    fused = filter_test.filter_ace_me_novel(img, stages)
+    diff = np.abs(reference.astype(np.int16) - fused.astype(np.int16))
+
+    rows = []
+    for label, fn in (("reference", filter_test.filter_ace_me_reference),
+                      ("fused", filter_test.filter_ace_me_novel)):
+        call = lambda fn=fn: fn(img, stages)
+        rows.append({
+            "implementation": label,
+            "ms": f"{time_call(call, args.repeat) * 1000:.2f}",
+            "peak_alloc_kb": f"{peak_alloc_bytes(call) / 1024:.0f}",
+        })
+
+    print(f"\nACE-ME on {img.shape[1]}x{img.shape[0]} (bilateral stage excluded)")
+    print_table(rows, ["implementation", "ms", "peak_alloc_kb"])
+    print(f"\nMax abs difference: {int(diff.max())} grey levels "
+          f"({np.count_nonzero(diff) / diff.size:.4%} of pixels differ), tolerance 1")
+    if diff.max() > 1:
+        raise SystemExit("Fused ACE-ME is outside tolerance")
+
+# =============================================================================
+# FULL RESOLUTION: TILED VS WHOLE IMAGE
+# =============================================================================
+
+def bench_full_res(args):
+    import filters
+    import filter_test
+    import filter_tiles
+
+    img = load_benchmark_image(args.image, args.max_dim)
+    rows = []
+    for name in filters.FILTERS:
+        tiled = lambda: filter_tiles.apply_filter_tiled(name, img, tile_size=args.tile_size)
+        whole = lambda: filters.apply_filter(name, img)
+        row = {
+            "filter": name,
+            "mode": "tiled" if filter_tiles.is_tiled(name, img, args.tile_size) else "whole",
+            "ms": f"{time_call(tiled, 1) * 1000:.0f}",
+            "peak_mb": f"{peak_alloc_bytes(tiled) / 2**20:.1f}",
+            "whole_peak_mb": "",
+            "identical": "",
+        }
+        if row["mode"] == "tiled":
+            row["whole_peak_mb"] = f"{peak_alloc_bytes(whole) / 2**20:.1f}"
+            row["identical"] = str(bool(np.array_equal(tiled(), whole())))
+        rows.append(row)
+
+    print(f"\nFull resolution {img.shape[1]}x{img.shape[0]}, tile {args.tile_size}, "
+          f"{filters.FILTER_THREADS} threads (output image: {img.nbytes / 2**20:.1f} MB)")
+    print_table(rows, ["filter", "mode", "ms", "peak_mb", "whole_peak_mb", "identical"])
+
+    processed = filters.apply_filter("Unsharp_Mask", img)
+    tiled = lambda: filter_tiles.tiled_metrics(img, processed, tile_size=args.tile_size)
+    whole = lambda: filter_test.compute_metrics(img, processed)
+    a, b = tiled(), whole()
+    print(f"\nMetrics: tiled peak {peak_alloc_bytes(tiled) / 2**20:.1f} MB, "
+          f"whole-image peak {peak_alloc_bytes(whole) / 2**20:.1f} MB, "
+          f"max abs difference {max(abs(a[k] - b[k]) for k in a):.2e}")
+
+# =============================================================================
+# BATCHED FILTER BANK: STACK VS PER-IMAGE LOOP
+# =============================================================================
+
+def bench_batch(args):
+    import cv2
+    import filters
+    import filter_test
+    import filter_batch
+
+    base = load_benchmark_image(args.image, args.max_dim)
+    rng = np.random.default_rng(1)
+    # Same fundus, different noise and brightness per image
+    stack = np.stack([cv2.add(cv2.convertScaleAbs(base, alpha=rng.uniform(0.8, 1.2)),
+                              rng.integers(0, 20, base.shape, dtype=np.uint8))
+                      for _ in range(args.count)])
+
+    rows = []
+    for name in filters.FILTERS:
+        batch = filter_batch.apply_filter_batch(name, stack)
+        loop = np.stack([filters.apply_filter(name, img) for img in stack])
+        rows.append({
+            "filter": name,
+            "loop_ms": f"{time_call(lambda: [filters.apply_filter(name, img) for img in stack], args.repeat) * 1000:.1f}",
+            "batch_ms": f"{time_call(lambda: filter_batch.apply_filter_batch(name, stack), args.repeat) * 1000:.1f}",
+            "identical": str(bool(np.array_equal(batch, loop))),
+        })
+
+    processed = filter_batch.apply_filter_batch("Unsharp_Mask", stack)
+    loop_metrics = lambda: [filter_test.compute_metrics(o, p) for o, p in zip(stack, processed)]
+    batch_metrics = lambda: filter_batch.compute_metrics_batch(stack, processed)
+    error = max(abs(a[k] - b[k]) for a, b in zip(loop_metrics(), batch_metrics()) for k in a)
+    rows.append({
+        "filter": "compute_metrics",
+        "loop_ms": f"{time_call(loop_metrics, args.repeat) * 1000:.1f}",
+        "batch_ms": f"{time_call(batch_metrics, args.repeat) * 1000:.1f}",
+        "identical": f"max err {error:.1e}",
+    })
+
+    print(f"\n{args.count} images of {base.shape[1]}x{base.shape[0]}, {os.cpu_count()} CPUs, "
+          f"{filters.FILTER_THREADS} filter threads")
+    print_table(rows, ["filter", "loop_ms", "batch_ms", "identical"])
+
+# =============================================================================
+# CLAHE_WAVELET: HAAR DENOISER VS SKIMAGE
+# =============================================================================
+
+def bench_wavelet(args):
+    import filter_test
+    from skimage.restoration import denoise_wavelet
+
+    rows = []
+    worst = 0
+    for size in args.sizes:
+        img = load_benchmark_image(args.image, size)
+        cl = filter_test.filter_clahe(img)
+        reference = lambda: denoise_wavelet(cl, method='BayesShrink', mode='soft', rescale_sigma=True)
+        haar = lambda: filter_test.denoise_wavelet_haar(cl)
+        a = filter_test.filter_clahe_wavelet(img, denoiser="skimage")
+        b = filter_test.filter_clahe_wavelet(img, denoiser="haar")
+        diff = np.abs(a.astype(np.int16) - b.astype(np.int16))
+        worst = max(worst, int(diff.max()))
+        rows.append({
+            "size": f"{img.shape[1]}x{img.shape[0]}",
+            "skimage_ms": f"{time_call(reference, args.repeat) * 1000:.1f}",
+            "haar_ms": f"{time_call(haar, args.repeat) * 1000:.1f}",
+            "float_err": f"{np.abs(reference() - haar()).max():.1e}",
+            "max_diff": str(int(diff.max())),
+            "pixels_differ": f"{np.count_nonzero(diff) / diff.size:.4%}",
+        })
+
+    print(f"\nWavelet denoising after CLAHE, {filter_test.WAVELET_THREADS} wavelet threads")
+    print_table(rows, ["size", "skimage_ms", "haar_ms", "float_err", "max_diff", "pixels_differ"])
+    print(f"\nMax abs difference of CLAHE_Wavelet: {worst} grey levels, tolerance 1")
+    if worst > 1:
+        raise SystemExit("Haar denoiser is outside tolerance")
+
+# =============================================================================
+# APPROXIMATE BILATERAL: BILATERAL AND ACE-ME
+# =============================================================================
+
+def bench_bilateral(args):
+    import filter_test
+    from filter_stages import StageCache
+    from skimage.metrics import structural_similarity as ssim
+
+    def fidelity(exact, approx):
+        mse = np.mean((exact.astype(np.float64) - approx) ** 2)
+        psnr = 100 if mse == 0 else 20 * np.log10(255.0 / np.sqrt(mse))
+        return psnr, ssim(exact, approx)
+
+    rows = []
+    failed = False
+    for size in args.sizes:
+        img = load_benchmark_image(args.image, size)
+        exact = filter_test.filter_bilateral(img, scale=1)
+        reference_ace = filter_test.filter_ace_me_reference(img).astype(np.int16)
+        for scale in [1] + args.scales:
+            bil = lambda: filter_test.filter_bilateral(img, scale=scale)
+            psnr, s = fidelity(exact, bil())
+            bound = filter_test.BILATERAL_BOUNDS.get(scale) \
+                if max(img.shape) >= filter_test.BILATERAL_BOUND_MIN_DIM else None
+            # ACE-ME after the Bilateral filter on one stage cache, as in the bank
+            stages = StageCache()
+            filter_test.filter_bilateral(img, stages, scale=scale)
+            ace = lambda: filter_test.filter_ace_me_novel(img, stages)
+            ace_diff = int(np.abs(ace().astype(np.int16) - reference_ace).max())
+            if (bound and (psnr < bound[0] or s < bound[1])) or ace_diff > 1:
+                failed = True
+            rows.append({
+                "size": f"{img.shape[1]}x{img.shape[0]}",
+                "scale": str(scale),
+                "bilateral_ms": f"{time_call(bil, args.repeat) * 1000:.1f}",
+                "psnr": f"{psnr:.1f}",
+                "ssim": f"{s:.4f}",
+                "bound": f"{bound[0]:g} dB / {bound[1]:g}" if bound else "-",
+                "ace_me_ms": f"{time_call(ace, args.repeat) * 1000:.1f}",
+                "ace_max_diff": str(ace_diff),
+            })
+
+    print("\nApproximate bilateral (scale > 1) against the exact filter (scale 1)")
+    print_table(rows, ["size", "scale", "bilateral_ms", "psnr", "ssim", "bound", "ace_me_ms", "ace_max_diff"])
+    print(f"\nBilateral bound applies from {filter_test.BILATERAL_BOUND_MIN_DIM} px; "
+          f"ACE-ME always uses the exact filter, tolerance 1 grey level against the reference")
+    if failed:
+        raise SystemExit("Approximate bilateral or ACE-ME is outside the bound")
+
+# =============================================================================
+# METRICS: REFERENCE-AWARE ENGINE VS COMPUTE_METRICS
+# =============================================================================
+
+METRICS_TOLERANCE = 1e-9 # relative, SSIM excluded
+SSIM_TOLERANCE = {1: 1e-6, 2: 1e-3, 3: 5e-3, 4: 5e-3} # absolute, by ssim_step
+
+def bench_metrics(args):
+    import filters
+    import filter_test
+
+    img = load_benchmark_image(args.image, args.max_dim)
+    candidates = {name: filters.apply_filter(name, img) for name in filters.FILTERS}
+    stack = np.stack(list(candidates.values()))
+
+    rows = []
+    worst = 0.0
+    for label, metrics in (("all", filter_test.METRIC_NAMES),
+                           ("without SSIM", tuple(m for m in filter_test.METRIC_NAMES if m != "SSIM"))):
+        per_call = lambda: [filter_test.compute_metrics(img, p, metrics) for p in candidates.values()]
+        engine = lambda: [filter_test.ReferenceMetrics(img, metrics, 1)(p) for p in candidates.values()]
+        stacked = lambda: filter_test.ReferenceMetrics(img, metrics, 1).evaluate_stack(stack)
+        for a, b, c in zip(per_call(), engine(), stacked()):
+            for k in a:
+                if k != "SSIM":
+                    scale = max(1.0, abs(a[k]))
+                    worst = max(worst, abs(a[k] - b[k]) / scale, abs(a[k] - c[k]) / scale)
+        rows.append({
+            "metrics": label,
+            "compute_metrics_ms": f"{time_call(per_call, args.repeat) * 1000:.1f}",
+            "engine_ms": f"{time_call(engine, args.repeat) * 1000:.1f}",
+            "stack_ms": f"{time_call(stacked, args.repeat) * 1000:.1f}",
+        })
+
+    print(f"\nMetrics for {len(candidates)} filter outputs of {img.shape[1]}x{img.shape[0]}")
+    print_table(rows, ["metrics", "compute_metrics_ms", "engine_ms", "stack_ms"])
+    print(f"\nMax relative difference (SSIM excluded): {worst:.1e}, tolerance {METRICS_TOLERANCE:.0e}")
+    failed = worst > METRICS_TOLERANCE
+
+    reference_ssim = [filter_test.compute_metrics(img, p, ("SSIM",))["SSIM"] for p in candidates.values()]
+    skimage_ms = time_call(lambda: [filter_test.compute_metrics(img, p, ("SSIM",))
+                                    for p in candidates.values()], args.repeat) * 1000
+    rows = []
+    for step in args.ssim_steps:
+        reference = filter_test.ReferenceMetrics(img, ("SSIM",), step)
+        error = max(abs(reference(p)["SSIM"] - r) for p, r in zip(candidates.values(), reference_ssim))
+        tolerance = SSIM_TOLERANCE.get(step)
+        failed |= tolerance is not None and error > tolerance
+        rows.append({
+            "ssim_step": str(step),
+            "skimage_ms": f"{skimage_ms:.1f}",
+            "engine_ms": f"{time_call(lambda: [reference(p) for p in candidates.values()], args.repeat) * 1000:.1f}",
+            "max_abs_error": f"{error:.1e}",
+            "tolerance": "-" if tolerance is None else f"{tolerance:.0e}",
+        })
+    print("\nSSIM (original side cached)")
+    print_table(rows, ["ssim_step", "skimage_ms", "engine_ms", "max_abs_error", "tolerance"])
+    if failed:
+        raise SystemExit("Metrics engine is outside tolerance")
+
+# =============================================================================
+# PSEUDO-MASKS: COMPONENT CLEANUP AND BATCHES
+# =============================================================================
+
+def _remove_small_components_loop(mask, min_area):
+    # The cleanup mask_generation used before: one full-image pass per label
+    import cv2
+    num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    clean_mask = np.zeros_like(mask)
+    for i in range(1, num_labels):
+        if stats[i, cv2.CC_STAT_AREA] > min_area:
+            clean_mask[labels == i] = 255
+    return clean_mask
+
+def bench_masks(args):
+    import cv2
+    import mask_generation
+
+    params = mask_generation.MASK_PARAMS
+    rows = []
+    identical = True
+    rng = np.random.default_rng(0)
+    for size in args.sizes:
+        if args.image:
+            # The image's mask right before the cleanup step, at this size
+            img = cv2.resize(load_benchmark_image(args.image, size), (size, size))
+            enhanced = cv2.createCLAHE(clipLimit=params["clip_limit"],
+                                       tileGridSize=(params["tile_grid"],) * 2).apply(img)
+            mask = cv2.adaptiveThreshold(enhanced, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                         cv2.THRESH_BINARY_INV, params["block_size"], params["c"])
+            kernel = np.ones((params["open_kernel"],) * 2, np.uint8)
+            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+        else:
+            # Worst case of a noisy fundus: thousands of blobs, many above min_area
+            noise = cv2.GaussianBlur(rng.normal(0, 1, (size, size)), (0, 0), 1.5)
+            mask = ((noise > 0.05) * 255).astype(np.uint8)
+        loop = lambda: _remove_small_components_loop(mask, params["min_area"])
+        lut = lambda: mask_generation.remove_small_components(mask, params["min_area"])
+        same = bool(np.array_equal(loop(), lut()))
+        identical &= same
+        rows.append({
+            "size": f"{size}x{size}",
+            "components": str(cv2.connectedComponents(mask, connectivity=8)[0] - 1),
+            "loop_ms": f"{time_call(loop, args.repeat) * 1000:.1f}",
+            "lut_ms": f"{time_call(lut, args.repeat) * 1000:.2f}",
+            "identical": str(same),
+        })
+
+    print("\nSmall-component removal")
+    print_table(rows, ["size", "components", "loop_ms", "lut_ms", "identical"])
+
+    base = load_benchmark_image(args.image, 512)
+    rng = np.random.default_rng(1)
+    stack = np.stack([cv2.add(base, rng.integers(0, 20, base.shape, dtype=np.uint8))
+                      for _ in range(args.count)])
+    batch_s = time_call(lambda: mask_generation.pseudo_masks(stack), 1)
+    print(f"\npseudo_masks: {args.count} images of {base.shape[1]}x{base.shape[0]} in "
+          f"{batch_s * 1000:.0f} ms ({args.count / batch_s:.0f} masks/s, "
+          f"{mask_generation.MASK_THREADS} threads)")
+    if not identical:
+        raise SystemExit("Vectorised cleanup differs from the loop")
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="RetinaLens backend benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("inference", help="Micro-batching throughput vs latency")
+    p.add_argument("--model", choices=["segmentation", "classification"], default="segmentation")
+    p.add_argument("--clients", type=int, default=8)
+    p.add_argument("--requests", type=int, default=64)
+    p.add_argument("--batch-sizes", type=int, nargs="+", default=[4, 8])
+    p.add_argument("--windows-ms", type=float, nargs="+", default=[2.0, 10.0, 25.0])
+    p.set_defaults(func=bench_inference)
+
+    p = sub.add_parser("filters", help="Filter bank wall time by worker count")
+    p.add_argument("--image", help="Grayscale test image (synthetic if omitted)")
+    p.add_argument("--max-dim", type=int, default=512)
+    p.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    p.add_argument("--processes", type=int, default=0)
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_filters)
+
+    p = sub.add_parser("ace-me", help="Fused ACE-ME vs reference: time, memory, equivalence")
+    p.add_argument("--image", help="Grayscale test image (synthetic if omitted)")
+    p.add_argument("--max-dim", type=int, default=512)
+    p.add_argument("--repeat", type=int, default=20)
+    p.set_defaults(func=bench_ace_me)
+
+    p = sub.add_parser("full-res", help="Tiled full-resolution filters: memory and equivalence")
+    p.add_argument("--image", help="Grayscale test image (synthetic if omitted)")
+    p.add_argument("--max-dim", type=int, default=3000)
+    p.add_argument("--tile-size", type=int, default=512)
+    p.set_defaults(func=bench_full_res)
+
+    p = sub.add_parser("batch", help="Batched filter bank and metrics vs per-image loop")
+    p.add_argument("--image", help="Grayscale test image (synthetic if omitted)")
+    p.add_argument("--max-dim", type=int, default=512)
+    p.add_argument("--count", type=int, default=16)
+    p.add_argument("--repeat", type=int, default=1)
+    p.set_defaults(func=bench_batch)
+
+    p = sub.add_parser("wavelet", help="CLAHE_Wavelet Haar denoiser vs skimage: time, equivalence")
+    p.add_argument("--image", help="Grayscale test image (synthetic if omitted)")
+    p.add_argument("--sizes", type=int, nargs="+", default=[512, 1024, 2048])
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_wavelet)
+
+    p = sub.add_parser("bilateral", help="Approximate bilateral vs exact: time, quality; ACE-ME stays exact")
+    p.add_argument("--image", help="Grayscale test image (synthetic if omitted)")
+    p.add_argument("--sizes", type=int, nargs="+", default=[512, 1024, 3000])
+    p.add_argument("--scales", type=int, nargs="+", default=[2, 4])
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_bilateral)
+
+    p = sub.add_parser("metrics", help="Reference-aware metrics engine vs compute_metrics: time, equivalence")
+    p.add_argument("--image", help="Grayscale test image (synthetic if omitted)")
+    p.add_argument("--max-dim", type=int, default=512)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--ssim-steps", type=int, nargs="+", default=[1, 2, 4])
+    p.set_defaults(func=bench_metrics)
+
+    p = sub.add_parser("masks", help="Pseudo-mask component cleanup (loop vs LUT) and batch throughput")
+    p.add_argument("--image", help="Grayscale test image (synthetic if omitted)")
+    p.add_argument("--sizes", type=int, nargs="+", default=[256, 512, 1024])
+    p.add_argument("--count", type=int, default=64)
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_masks)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
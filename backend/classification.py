@@ -1,17 +1,14 @@
 import cv2
 import numpy as np
-import tensorflow as tf
 from tensorflow.keras.models import load_model
 import os
-import gc
+from model_registry import registry
+from inference_batcher import MicroBatcher
 
 CLASSES = ["No_DR", "Mild_DR", "Severe_DR"]
+MODEL_NAME = "dr_classifier"
 
-def get_model():
-    global model
-    if model is not None:
-        return model
-
+def _load_model():
     curr_dir = os.path.dirname(os.path.abspath(__file__))
     model_path = os.path.join(curr_dir, "models", "dr_classifier.h5")
     
@@ -28,28 +25,38 @@ def get_model():
         model = None
     return model
 
-model = None
+registry.register(MODEL_NAME, _load_model)
 
-def classify_image(image_path):
-    global model
-    if model is None:
-        model = get_model()
+def get_model():
+    # Model stays resident in the registry between requests
+    return registry.get(MODEL_NAME)
+
+def _predict_batch(batch):
+    model = get_model()
     if model is None:
-        return "Unknown", 0.0
-    img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+        raise RuntimeError("Classifier model not loaded")
+    return model.predict(batch, verbose=0)
+
+# Concurrent requests share one forward pass
+batcher = MicroBatcher(MODEL_NAME, _predict_batch)
+
+def preprocess(img):
     img = cv2.resize(img, (224, 224))
-    img = img / 255.0
-    img = np.expand_dims(img, axis=(0, -1))
+    img = img.astype(np.float32) / 255.0
+    return np.expand_dims(img, axis=-1)
+
+def predict_label(img_input):
+    if get_model() is None:
+        return "Unknown", 0.0
 
-    preds = model.predict(img)[0]
+    preds = batcher.predict(img_input)
     idx = np.argmax(preds)
     
     label = CLASSES[idx]
     conf = float(preds[idx])
     
-    # Critical: Free memory
-    model = None
-    tf.keras.backend.clear_session()
-    gc.collect()
-    
     return label, conf
+
+def classify_image(image_path):
+    img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    return predict_label(preprocess(img))
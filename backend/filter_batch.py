@@ -0,0 +1,157 @@
+import os
+import functools
+import cv2
+import numpy as np
+import filter_test
+from filter_test import SSIM_STEP, ReferenceMetrics
+from filters import FILTERS, MAX_DIM, METRIC_NAMES, apply_filter, failed_metrics, pool_for
+from filter_stages import StageCache
+
+# ==============================
+# BATCHED FILTER BANK
+# ==============================
+# Batch variants of the filter bank and compute_metrics for stacks of
+# equally sized images (N, H, W), for dataset-scale studies:
+#   - stackable filters (the FFT filters) take sub-stacks of one image per core at once: the
+#     FFT workers then transform several images in parallel, while each
+#     transform stays small enough to run from cache (a whole 32-image
+#     stack at 512px is slower than a loop on a single core)
+#   - filters registered with a lut (Median_Gamma) run their base step per
+#     image and apply the LUT to the whole stack in one call
+#   - everything else fans out per image over the filter worker pools
+#     (threads, or processes for filters that hold the GIL)
+#   - metrics are computed for the whole stack from per-image histograms,
+#     with SSIM from filter_test's float32 window moments (SSIM_STEP
+#     applies), matching compute_metrics per image
+# Shared intermediates (median, bilateral, CLAHE, FFT) are still computed
+# once per image (see BatchStages). Keep stacks to a few dozen images (see
+# iter_image_batches) since every filter's output for the stack is held in
+# memory.
+
+DEFAULT_BATCH_SIZE = 32
+BATCH_SIZE = int(os.environ.get("FILTER_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+
+STACK_CHUNK = max(1, os.cpu_count() or 1)
+
+
+class BatchStages:
+    """
+    Shared intermediates for one stack: a StageCache per image for the
+    per-image filters and one per sub-stack for the stackable filters.
+    """
+    def __init__(self, count):
+        self.images = [StageCache() for _ in range(count)]
+        self.chunks = {}
+
+    def chunk(self, start):
+        if start not in self.chunks:
+            self.chunks[start] = StageCache()
+        return self.chunks[start]
+
+
+def load_image_stack(paths, shape=(MAX_DIM, MAX_DIM)):
+    """
+    Reads grayscale images and resizes them to shape (H, W) as one stack.
+    """
+    stack = np.empty((len(paths),) + tuple(shape), np.uint8)
+    for i, path in enumerate(paths):
+        img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            raise ValueError(f"Could not read image at {path}")
+        stack[i] = cv2.resize(img, (shape[1], shape[0]))
+    return stack
+
+def iter_image_batches(paths, shape=(MAX_DIM, MAX_DIM), batch_size=BATCH_SIZE):
+    """
+    Yields (paths, stack) for consecutive batches of at most batch_size images.
+    """
+    paths = list(paths)
+    for start in range(0, len(paths), batch_size):
+        chunk = paths[start:start + batch_size]
+        yield chunk, load_image_stack(chunk, shape)
+
+def _fan_out(name, stack, stages, fn=None):
+    # fn(img, stages) per image, on the pool the registry picks for name
+    fn = fn or functools.partial(apply_filter, name)
+    pool = pool_for(name)
+    if pool is None:
+        return np.stack([fn(img, s) for img, s in zip(stack, stages.images)])
+    return np.stack(list(pool.map(fn, stack, stages.images)))
+
+def apply_filter_batch(name, stack, stages=None):
+    """
+    Returns the (N, H, W) result of one filter on a stack. Pass the same
+    BatchStages to every filter of a stack to share intermediates.
+    """
+    stages = BatchStages(len(stack)) if stages is None else stages
+    spec = FILTERS[name]
+    if spec.stackable:
+        return np.concatenate([apply_filter(name, stack[i:i + STACK_CHUNK], stages.chunk(i))
+                               for i in range(0, len(stack), STACK_CHUNK)])
+    if spec.lut is not None:
+        base, table = spec.lut
+        bases = _fan_out(name, stack, stages, functools.partial(base, **spec.params_for(base)))
+        lut = table(**spec.params_for(table))
+        return cv2.LUT(bases.reshape(-1, bases.shape[-1]), lut).reshape(bases.shape)
+    return _fan_out(name, stack, stages)
+
+# ==============================
+# BATCHED METRICS
+# ==============================
+def _ssim_batch(originals, processed, ssim_step=SSIM_STEP):
+    # Per image through ReferenceMetrics.ssim (_ssim_input/_local_moments),
+    # with compute_metrics' data range: that of the processed image
+    return [ReferenceMetrics(o, ("SSIM",), ssim_step).ssim(p, float(p.max()) - float(p.min()))
+            for o, p in zip(originals, processed)]
+
+def compute_metrics_batch(originals, processed, metrics=METRIC_NAMES, ssim_step=SSIM_STEP):
+    """
+    compute_metrics for two (N, H, W) stacks. Returns one metrics dict per
+    image. ssim_step > 1 approximates SSIM (see filter_test.ReferenceMetrics).
+    """
+    n = originals.shape[0]
+    columns = {}
+
+    if "MSE" in metrics or "PSNR" in metrics:
+        mse = [cv2.norm(o, p, cv2.NORM_L2SQR) / p.size for o, p in zip(originals, processed)]
+        columns["MSE"] = mse
+        columns["PSNR"] = [100 if m == 0 else 20 * np.log10(255.0 / np.sqrt(m)) for m in mse]
+
+    if "SSIM" in metrics:
+        columns["SSIM"] = _ssim_batch(originals, processed, ssim_step)
+
+    if "Entropy" in metrics or "CII" in metrics:
+        # Entropy and std from one 256-bin histogram per image
+        cont_proc, entropy, _, _ = filter_test.histogram_stats(
+            np.stack([filter_test.histogram_u8(p) for p in processed]))
+        columns["Entropy"] = entropy
+        if "CII" in metrics:
+            cont_orig = filter_test.histogram_stats(
+                np.stack([filter_test.histogram_u8(o) for o in originals]))[0]
+            columns["CII"] = [0 if o == 0 else p / o for o, p in zip(cont_orig, cont_proc)]
+
+    names = [name for name in METRIC_NAMES if name in metrics]
+    return [{name: columns[name][i] for name in names} for i in range(n)]
+
+# ==============================
+# APPLY
+# ==============================
+def apply_filters_batch(stack, names=None, metrics=METRIC_NAMES):
+    """
+    Batch version of filters.apply_filters_to_array: returns
+    {name: {"images": (N, H, W), "metrics": [dict per image]}} in FILTERS
+    order. A failing filter falls back to the originals.
+    """
+    names = list(FILTERS) if names is None else list(names)
+    stages = BatchStages(len(stack))
+    results = {}
+    for name in names:
+        try:
+            processed = apply_filter_batch(name, stack, stages)
+            computed = compute_metrics_batch(stack, processed, metrics)
+        except Exception as e:
+            print(f"Filter {name} failed: {e}")
+            processed = stack
+            computed = [failed_metrics(metrics) for _ in stack]
+        results[name] = {"images": processed, "metrics": computed}
+    return {name: results[name] for name in FILTERS if name in results}
@@ -0,0 +1,153 @@
+import inspect
+from filter_test import (
+    filter_mean,
+    filter_median,
+    filter_gaussian,
+    filter_bilateral,
+    filter_laplacian_sharpen,
+    filter_unsharp_masking,
+    filter_clahe,
+    filter_ideal_lpf,
+    filter_gaussian_lpf,
+    filter_ideal_hpf,
+    filter_homomorphic,
+    filter_median_gamma,
+    filter_median_laplacian,
+    gamma_table,
+    filter_clahe_wavelet,
+    filter_ace_me_novel,
+    BILATERAL_SCALE
+)
+
+# ==============================
+# FILTER REGISTRY
+# ==============================
+# Every filter of the bank is registered here once, with the metadata the
+# API, the scheduler (filters), the tiled and batch runners and the
+# filter_test demo need:
+#   name          API name, also the key in FILTERS (registration order is
+#                 the order results are returned in)
+#   label         display name for plots and reports
+#   params        tunable keyword arguments and their defaults (read from
+#                 the function signature unless given)
+#   param_types   int, float or str per param, for parsing swept values;
+#                 the type of the default unless given (float params with
+#                 an int default must be listed)
+#   cost          rough cost in ms on a 512px image, filter only; used to
+#                 order work, only the relative values matter
+#   releases_gil  False for filters dominated by Python code; those run on
+#                 the process pool
+#   stages        shared intermediates (StageCache keys) the filter uses
+#   halo          kernel radius for tiled full-resolution runs, or None if
+#                 the filter needs the whole image
+#   stackable     accepts an (N, H, W) stack directly
+#   lut           (base, table) for filters that end in a 256-entry LUT:
+#                 the output is cv2.LUT(base(img, stages), table()), each
+#                 called with the params it declares; batch runs apply the
+#                 table to a whole stack in one call
+# Adding a filter means one register_filter call.
+
+
+class FilterSpec:
+    def __init__(self, name, func, label=None, params=None, param_types=None, cost=1.0,
+                 releases_gil=True, stages=(), halo=None, stackable=False, lut=None):
+        signature = inspect.signature(func).parameters
+        self.name = name
+        self.func = func
+        self.label = label or name
+        self.params = dict(params) if params is not None else {
+            key: p.default for key, p in signature.items()
+            if p.default is not inspect.Parameter.empty and key != "stages"
+        }
+        self.param_types = {key: type(value) for key, value in self.params.items()}
+        self.param_types.update(param_types or {})
+        self.cost = cost
+        self.releases_gil = releases_gil
+        self.stages = tuple(stages)
+        self.halo = halo
+        self.stackable = stackable
+        self.lut = lut
+        self.stage_aware = "stages" in signature
+
+    def __call__(self, img, stages=None, **params):
+        """
+        Runs the filter with its registered params, overridden by params.
+        """
+        kwargs = {**self.params, **params}
+        if stages is not None and self.stage_aware:
+            kwargs["stages"] = stages
+        return self.func(img, **kwargs)
+
+    def params_for(self, func, **params):
+        """
+        The registered params, overridden by params, that func accepts.
+        """
+        accepted = inspect.signature(func).parameters
+        return {key: value for key, value in {**self.params, **params}.items() if key in accepted}
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "label": self.label,
+            "params": self.params,
+            "cost": self.cost,
+            "releases_gil": self.releases_gil,
+            "stages": list(self.stages),
+            "tiled": self.halo is not None,
+            "stackable": self.stackable,
+        }
+
+
+FILTERS = {}
+
+def register_filter(name, func, **meta):
+    """
+    Adds a filter to the bank (see FilterSpec for the metadata) and returns its spec.
+    """
+    if name in FILTERS:
+        raise ValueError(f"Filter already registered: {name}")
+    spec = FILTERS[name] = FilterSpec(name, func, **meta)
+    return spec
+
+def filter_specs(names=None):
+    return [FILTERS[name] for name in (FILTERS if names is None else names)]
+
+def original(img):
+    return img
+
+# Stage keys of the exact bilateral filter (ACE-ME) and of the bank's
+# Bilateral filter (see filter_test.filter_bilateral)
+EXACT_BILATERAL_STAGE = "bilateral9_75_75"
+BILATERAL_STAGE = EXACT_BILATERAL_STAGE + ("" if BILATERAL_SCALE == 1 else f"_x{BILATERAL_SCALE}")
+
+
+register_filter("Original", original, cost=0.0, halo=0, stackable=True)
+register_filter("Mean", filter_mean, label="Mean Filter", cost=0.1, halo=2)
+register_filter("Median", filter_median, label="Median Filter", cost=0.8,
+                stages=("median5",), halo=2)
+register_filter("Gaussian", filter_gaussian, label="Gaussian Smooth", cost=0.3, halo=2,
+                param_types={"sigma": float})
+# The approximate bilateral filter (BILATERAL_SCALE > 1) works on a downsampled
+# grid, so tiles would not match the whole-image result
+register_filter("Bilateral", filter_bilateral, cost=8.1 if BILATERAL_SCALE == 1 else 2.7,
+                param_types={"sigma_color": float, "sigma_space": float},
+                stages=(BILATERAL_STAGE,), halo=4 if BILATERAL_SCALE == 1 else None)
+register_filter("Laplacian", filter_laplacian_sharpen, cost=0.2, halo=1)
+register_filter("Unsharp_Mask", filter_unsharp_masking, label="Unsharp Mask", cost=0.8, halo=4)
+register_filter("CLAHE", filter_clahe, cost=1.4, stages=("clahe2.0_8x8",))
+register_filter("Ideal_LPF", filter_ideal_lpf, label="Ideal LPF", cost=7.8,
+                stages=("rfft2",), stackable=True)
+register_filter("Gaussian_LPF", filter_gaussian_lpf, label="Gaussian LPF", cost=5.7,
+                stages=("rfft2",), stackable=True)
+register_filter("Ideal_HPF", filter_ideal_hpf, label="Ideal HPF", cost=6.3,
+                stages=("rfft2",), stackable=True)
+register_filter("Homomorphic", filter_homomorphic, cost=6.9, stackable=True,
+                param_types={"d0": float, "c": float})
+register_filter("Median_Gamma", filter_median_gamma, label="Median + Gamma", cost=0.9,
+                stages=("median5",), halo=2, lut=(filter_median, gamma_table))
+register_filter("Median_Laplacian", filter_median_laplacian, label="Median + Laplacian",
+                cost=0.9, stages=("median5",), halo=3)
+register_filter("CLAHE_Wavelet", filter_clahe_wavelet, label="CLAHE + Wavelet", cost=9.2,
+                stages=("clahe2.0_8x8",))
+register_filter("ACE_ME_Novel", filter_ace_me_novel, label="ACE-ME (Novel)", cost=12.7,
+                stages=(EXACT_BILATERAL_STAGE,))
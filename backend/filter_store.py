@@ -0,0 +1,185 @@
+import os
+import glob
+import json
+import threading
+import cv2
+from filters import FILTERS, METRIC_NAMES, failed_metrics, filter_fingerprint, iter_filters_parallel
+from filter_tiles import iter_filters_full_resolution
+
+# ==============================
+# PERSISTENT FILTER RESULT STORE
+# ==============================
+# Encoded filter outputs and their metrics live on disk under
+#   <root>/<image_key>/<filter>-<HxW>-q<quality>-<fingerprint>.bin
+# so results survive worker restarts. The fingerprint covers the filter's
+# code and parameters: editing one filter only orphans that filter's
+# entries, which are removed when it is next written and otherwise age out
+# through the size-based LRU eviction.
+
+DEFAULT_CACHE_DIR = os.path.join(os.getcwd(), "cache", "filters")
+DEFAULT_BUDGET_MB = 512
+DEFAULT_JPEG_QUALITY = 95  # OpenCV's default
+
+
+def encode_jpeg(img, quality=DEFAULT_JPEG_QUALITY):
+    ok, buffer = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    if not ok:
+        raise ValueError("Could not encode image as JPEG")
+    return buffer.tobytes()
+
+
+class FilterResultStore:
+    def __init__(self, root, budget_bytes):
+        self.root = root
+        self.budget_bytes = budget_bytes
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        os.makedirs(root, exist_ok=True)
+        self._used = sum(os.path.getsize(p) for p in self._entries())
+
+    def _entries(self):
+        return glob.glob(os.path.join(self.root, "*", "*.bin"))
+
+    def _prefix(self, image_key, name, shape, quality):
+        return os.path.join(self.root, image_key, f"{name}-{shape[0]}x{shape[1]}-q{quality}")
+
+    def get(self, image_key, name, shape, quality, fingerprint, metrics=METRIC_NAMES):
+        """
+        Returns (metrics, encoded bytes) or None. An entry that was stored with
+        fewer metrics than requested counts as a miss.
+        """
+        path = f"{self._prefix(image_key, name, shape, quality)}-{fingerprint}.bin"
+        try:
+            with open(path, "rb") as f:
+                header = json.loads(f.readline())
+                data = f.read()
+        except (OSError, ValueError):
+            header = None
+        if header is None or not set(metrics) <= set(header):
+            with self._lock:
+                self._counters["misses"] += 1
+            return None
+        try:
+            os.utime(path)  # mark as recently used for eviction
+        except OSError:
+            pass
+        with self._lock:
+            self._counters["hits"] += 1
+        return {k: header[k] for k in METRIC_NAMES if k in metrics}, data
+
+    def put(self, image_key, name, shape, quality, fingerprint, metrics, data):
+        prefix = self._prefix(image_key, name, shape, quality)
+        path = f"{prefix}-{fingerprint}.bin"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Drop entries written by older versions of this filter
+        stale_pattern = f"{prefix}-*.bin"
+        for stale in glob.glob(stale_pattern):
+            if stale != path:
+                self._remove(stale, evicted=False)
+
+        header = json.dumps({k: float(v) for k, v in metrics.items()}).encode("utf-8")
+        payload = header + b"\n" + data
+        # Write to a temp file and rename, so readers never see a partial entry
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        replaced = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._used += len(payload) - replaced
+            self._counters["writes"] += 1
+            over_budget = self._used > self.budget_bytes
+        if over_budget:
+            self._evict()
+
+    def _remove(self, path, evicted=True):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            self._used -= size
+            if evicted:
+                self._counters["evictions"] += 1
+
+    def _evict(self):
+        # Oldest-used first, down to 90% of the budget to avoid evicting on every write
+        entries = []
+        for path in self._entries():
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+        entries.sort()
+        target = int(self.budget_bytes * 0.9)
+        for _, path in entries:
+            if self._used <= target:
+                break
+            self._remove(path)
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._counters,
+                "used_bytes": self._used,
+                "budget_bytes": self.budget_bytes,
+                "root": self.root,
+            }
+
+
+filter_store = FilterResultStore(
+    os.environ.get("FILTER_CACHE_DIR", DEFAULT_CACHE_DIR),
+    int(float(os.environ.get("FILTER_CACHE_MB", DEFAULT_BUDGET_MB)) * 1024 * 1024),
+)
+
+
+def iter_filters_cached(img, image_key, names=None, metrics=METRIC_NAMES,
+                        quality=DEFAULT_JPEG_QUALITY, full_resolution=False):
+    """
+    Yields (name, {"metrics", "encoded"}) as each result becomes available:
+    stored results first, then the remaining filters as they finish on the
+    filter worker pools.
+    names limits the filters run, metrics the metrics computed.
+    full_resolution runs the filters tiled (see filter_tiles); img is then
+    expected at its original size.
+    """
+    names = list(FILTERS) if names is None else list(names)
+    pending = []
+    for name in names:
+        fingerprint = filter_fingerprint(name)
+        cached = filter_store.get(image_key, name, img.shape, quality, fingerprint, metrics)
+        if cached is None:
+            pending.append(name)
+            continue
+        stored_metrics, data = cached
+        yield name, {"metrics": stored_metrics, "encoded": data}
+
+    if not pending:
+        return
+
+    run = iter_filters_full_resolution if full_resolution else iter_filters_parallel
+    for name, processed, computed, error in run(img, pending, metrics):
+        if error is not None:
+            print(f"Filter {name} failed: {error}")
+            # Fallback to original if filter fails (not persisted)
+            yield name, {"metrics": failed_metrics(metrics), "encoded": encode_jpeg(img, quality)}
+            continue
+
+        data = encode_jpeg(processed, quality)
+        filter_store.put(image_key, name, img.shape, quality, filter_fingerprint(name), computed, data)
+        yield name, {"metrics": computed, "encoded": data}
+
+
+def apply_filters_cached(img, image_key, names=None, metrics=METRIC_NAMES,
+                         quality=DEFAULT_JPEG_QUALITY, full_resolution=False):
+    """
+    Like filters.apply_filters_to_array, but returns JPEG bytes under "encoded"
+    and reuses any result already stored for this image and filter version.
+    """
+    names = list(FILTERS) if names is None else list(names)
+    results = dict(iter_filters_cached(img, image_key, names, metrics, quality, full_resolution))
+    # Keep the canonical filter order regardless of completion order
+    return {name: results[name] for name in FILTERS if name in results}
@@ -0,0 +1,231 @@
+"""
+Parameter sweeps for filter tuning.
+
+Usage:
+    python filter_sweep.py --images path/to/fundus_dir --filter Ideal_LPF --param cutoff=10:150:5
+    python filter_sweep.py --images a.jpg b.jpg --filter Median_Gamma --param gamma=0.6:2.0:0.05 --param ksize=3,5,7
+"""
+import argparse
+import glob
+import itertools
+import math
+import os
+import time
+import cv2
+import pandas as pd
+import filters
+from filters import FILTERS, METRIC_NAMES, ReferenceMetrics, resize_for_filters
+from filter_stages import StageCache
+from filter_test import SSIM_STEP
+
+# ==============================
+# PARAMETER SWEEPS
+# ==============================
+# Evaluates one filter over a grid of parameter values on a set of images
+# and ranks the parameter points by their mean metrics.
+#
+# Intermediates that do not depend on the swept parameter are computed once
+# per image: every image gets one StageCache shared by all its points, and
+# stage keys include only the parameters that affect them (one forward FFT
+# per image for all cutoffs, one median per image for all gammas). The
+# original's side of the metrics is likewise computed once per image (one
+# ReferenceMetrics shared by all its chunks).
+#
+# Work is split into (image, chunk of points) tasks on the filter worker
+# pools. Thread workers share the image's StageCache; process workers (for
+# filters that hold the GIL) compute the shared stages once per chunk.
+
+DEFAULT_CHUNK = 8
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp")
+
+
+def parse_values(raw, kind):
+    """
+    "a,b,c" or "start:stop:step" (stop inclusive) as values of type kind
+    (int, float or str; str takes "a,b,c" only). Raises ValueError for
+    values that do not fit kind.
+    """
+    if kind is str:
+        return list(dict.fromkeys(v.strip() for v in raw.split(",") if v.strip()))
+    if ":" in raw:
+        start, stop, step = (float(v) for v in raw.split(":"))
+        count = int(math.floor((stop - start) / step + 1e-9)) + 1
+        values = [start + i * step for i in range(count)]
+        values = [round(v, 10) for v in values]
+    else:
+        values = [float(v) for v in raw.split(",") if v.strip()]
+    if kind is int:
+        fractional = [v for v in values if not v.is_integer()]
+        if fractional:
+            raise ValueError(f"Expected integers, got {', '.join(f'{v:g}' for v in fractional)}")
+        return sorted({int(v) for v in values})
+    return values
+
+def parse_metrics(raw):
+    """
+    "PSNR,SSIM,..." as a tuple in METRIC_NAMES order. Unknown names raise ValueError.
+    """
+    names = [m.strip() for m in raw.split(",") if m.strip()]
+    unknown = [m for m in names if m not in METRIC_NAMES]
+    if unknown:
+        raise ValueError(f"Unknown metric {', '.join(unknown)} (available: {', '.join(METRIC_NAMES)})")
+    if not names:
+        raise ValueError("No metrics selected")
+    return tuple(m for m in METRIC_NAMES if m in names)
+
+def expand_grid(name, grid):
+    """
+    Returns the list of parameter dicts for grid ({param: [values]}).
+    Unknown parameters raise ValueError.
+    """
+    spec = FILTERS[name]
+    if not grid:
+        raise ValueError("Empty parameter grid")
+    unknown = [p for p in grid if p not in spec.params]
+    if unknown:
+        raise ValueError(f"{name} has no parameter {', '.join(unknown)} "
+                         f"(available: {', '.join(spec.params) or 'none'})")
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+def _sweep_chunk(name, img, points, stages, reference):
+    spec = FILTERS[name]
+    rows = []
+    for params in points:
+        try:
+            processed = spec(img, stages, **params)
+            if processed.shape != img.shape:
+                processed = cv2.resize(processed, (img.shape[1], img.shape[0]))
+            rows.append((params, reference(processed), None))
+        except Exception as e:
+            rows.append((params, None, str(e)))
+    return rows
+
+def run_sweep(name, images, grid, metrics=METRIC_NAMES, chunk=DEFAULT_CHUNK, progress=None,
+              ssim_step=SSIM_STEP):
+    """
+    Runs filter name for every point of grid on every (image_id, array) in
+    images. Returns a DataFrame with one row per image and point.
+    progress(done, total) is called as tasks finish. ssim_step > 1 trades
+    SSIM accuracy for speed (see filter_test.ReferenceMetrics).
+    """
+    points = expand_grid(name, grid)
+    pool = filters.pool_for(name)
+    tasks = []
+    for image_id, img in images:
+        stages = StageCache()
+        reference = ReferenceMetrics(img, metrics, ssim_step)
+        for start in range(0, len(points), chunk):
+            tasks.append((image_id, img, points[start:start + chunk], stages, reference))
+
+    if pool is None:
+        outputs = (_sweep_chunk(name, *task[1:]) for task in tasks)
+    else:
+        outputs = pool.map(_sweep_chunk, *zip(*[(name,) + task[1:] for task in tasks]))
+
+    records = []
+    done = 0
+    for (image_id, *_), rows in zip(tasks, outputs):
+        for params, computed, error in rows:
+            records.append({"image": image_id, **params, **(computed or {}), "error": error})
+        done += len(rows)
+        if progress:
+            progress(done, len(points) * len(images))
+    return pd.DataFrame.from_records(records)
+
+def rank_points(results, params, metrics=METRIC_NAMES, rank_by="score"):
+    """
+    Mean metrics per parameter point over all images, best first.
+    rank_by is a metric name or "score": the sum of SSIM, CII and PSNR each
+    divided by its best value (the heuristic filter_test.main uses).
+    """
+    ok = results[results["error"].isna()]
+    summary = ok.groupby(params, as_index=False)[list(m for m in METRIC_NAMES if m in metrics)].mean()
+    summary["images"] = ok.groupby(params).size().values
+    if rank_by == "score":
+        score_cols = [c for c in ("SSIM", "CII", "PSNR") if c in summary]
+        if not score_cols:
+            raise ValueError("score needs at least one of SSIM, CII, PSNR")
+        summary["score"] = sum(summary[c] / summary[c].max() for c in score_cols)
+    elif rank_by not in summary:
+        raise ValueError(f"Cannot rank by {rank_by}")
+    # Lower is better for MSE only
+    summary = summary.sort_values(rank_by, ascending=(rank_by == "MSE")).reset_index(drop=True)
+    summary.insert(0, "rank", range(1, len(summary) + 1))
+    return summary
+
+def load_sweep_images(paths, max_dim=filters.MAX_DIM):
+    """
+    [(image_id, grayscale array)] for image files and directories of images.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(f for f in glob.glob(os.path.join(path, "*"))
+                                if f.lower().endswith(IMAGE_EXTENSIONS)))
+        else:
+            files.append(path)
+    images = []
+    for f in files:
+        img = cv2.imread(f, cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            print(f"Skipping unreadable image {f}")
+            continue
+        images.append((os.path.basename(f), resize_for_filters(img, max_dim)))
+    return images
+
+# ==============================
+# MAIN
+# ==============================
+def main():
+    parser = argparse.ArgumentParser(description="Sweep filter parameters and rank the results")
+    parser.add_argument("--images", nargs="+", required=True, help="Image files or directories")
+    parser.add_argument("--filter", required=True, choices=list(FILTERS))
+    parser.add_argument("--param", action="append", default=[],
+                        help="name=v1,v2,... or name=start:stop:step (repeatable)")
+    parser.add_argument("--metrics", default=",".join(METRIC_NAMES))
+    parser.add_argument("--rank-by", default="score")
+    parser.add_argument("--max-dim", type=int, default=filters.MAX_DIM)
+    parser.add_argument("--ssim-step", type=int, default=SSIM_STEP,
+                        help="Evaluate SSIM at every n-th window (faster, approximate)")
+    parser.add_argument("--out", default=os.path.join("results", "sweep"))
+    args = parser.parse_args()
+
+    spec = FILTERS[args.filter]
+    grid = {}
+    for item in args.param:
+        key, _, raw = item.partition("=")
+        if key not in spec.params:
+            parser.error(f"{args.filter} has no parameter {key} (available: {', '.join(spec.params) or 'none'})")
+        try:
+            grid[key] = parse_values(raw, spec.param_types[key])
+        except ValueError as e:
+            parser.error(f"--param {key}: {e}")
+    if not grid:
+        parser.error("At least one --param is required")
+    try:
+        metrics = parse_metrics(args.metrics)
+    except ValueError as e:
+        parser.error(f"--metrics: {e}")
+
+    images = load_sweep_images(args.images, args.max_dim)
+    if not images:
+        parser.error("No readable images")
+    total = len(expand_grid(args.filter, grid)) * len(images)
+    print(f"Sweeping {args.filter} over {total // len(images)} points x {len(images)} images")
+
+    start = time.perf_counter()
+    def progress(done, total):
+        print(f"\r{done}/{total} evaluations, {time.perf_counter() - start:.0f}s", end="", flush=True)
+    results = run_sweep(args.filter, images, grid, metrics, progress=progress, ssim_step=args.ssim_step)
+    print()
+
+    summary = rank_points(results, list(grid), metrics, args.rank_by)
+    os.makedirs(args.out, exist_ok=True)
+    results.to_csv(os.path.join(args.out, f"{args.filter}_per_image.csv"), index=False)
+    summary.to_csv(os.path.join(args.out, f"{args.filter}_ranked.csv"), index=False)
+    print(summary.head(10).to_string(index=False))
+    print(f"\nResults saved to '{args.out}' ({time.perf_counter() - start:.1f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -7,9 +7,11 @@ import pandas as pd
 from skimage.metrics import structural_similarity as ssim
 from skimage.measure import shannon_entropy
 from skimage.exposure import match_histograms
-from scipy.fftpack import fft2, ifft2, fftshift, ifftshift
+from scipy import fft as sp_fft
+from functools import lru_cache
 import scipy.ndimage as ndimage
 import os
+import threading
 # import tkinter as tk
 # from tkinter import filedialog
 
@@ -43,65 +45,270 @@ def load_and_preprocess_image(image_path=None):
     
     return normalized, image_path
 
-def compute_metrics(original, processed):
+METRIC_NAMES = ("PSNR", "SSIM", "MSE", "Entropy", "CII")
+
+def compute_metrics(original, processed, metrics=METRIC_NAMES):
     """
     Computes PSNR, SSIM, MSE, Entropy, CII for a processed image compared to original.
+    Pass a subset of METRIC_NAMES as metrics to skip the others.
     """
     # Ensure processed is same type/size
     if original.shape != processed.shape:
         processed = cv2.resize(processed, (original.shape[1], original.shape[0]))
     
-    # MSE
-    mse = np.mean((original.astype("float") - processed.astype("float")) ** 2)
+    results = {}
     
-    # PSNR
-    if mse == 0:
-        psnr_val = 100
-    else:
-        psnr_val = 20 * np.log10(255.0 / np.sqrt(mse))
+    if "MSE" in metrics or "PSNR" in metrics:
+        # MSE
+        mse = np.mean((original.astype("float") - processed.astype("float")) ** 2)
+        results["MSE"] = mse
+        
+        # PSNR
+        if mse == 0:
+            results["PSNR"] = 100
+        else:
+            results["PSNR"] = 20 * np.log10(255.0 / np.sqrt(mse))
         
     # SSIM
-    ssim_val = ssim(original, processed, data_range=processed.max() - processed.min())
+    if "SSIM" in metrics:
+        results["SSIM"] = ssim(original, processed, data_range=processed.max() - processed.min())
     
     # Entropy
-    ent_val = shannon_entropy(processed)
+    if "Entropy" in metrics:
+        results["Entropy"] = shannon_entropy(processed)
     
     # CII (Contrast Improvement Index)
     # Defined here as ratio of contrast of processed to contrast of original.
     # Contrast measured as standard deviation.
-    cont_orig = np.std(original)
-    cont_proc = np.std(processed)
-    if cont_orig == 0:
-        cii_val = 0
-    else:
-        cii_val = cont_proc / cont_orig
+    if "CII" in metrics:
+        cont_orig = np.std(original)
+        cont_proc = np.std(processed)
+        if cont_orig == 0:
+            results["CII"] = 0
+        else:
+            results["CII"] = cont_proc / cont_orig
+
+    return {name: results[name] for name in METRIC_NAMES if name in metrics}
+
+def histogram_u8(img):
+    """
+    256-bin histogram of a uint8 image as int64 counts.
+    """
+    if img.size < (1 << 24): # calcHist counts in float32, exact below 2**24
+        return cv2.calcHist([img], [0], None, [256], [0, 256]).ravel().astype(np.int64)
+    return np.bincount(img.ravel(), minlength=256)
+
+_LEVELS = np.arange(256, dtype=np.float64)
+
+def histogram_stats(hist):
+    """
+    (std, entropy in bits, min, max) per row of (N, 256) histograms; std and
+    entropy match np.std and skimage's shannon_entropy of the images.
+    """
+    n = hist.sum(axis=1, dtype=np.float64)
+    mean = hist @ _LEVELS / n
+    std = np.sqrt(np.einsum("ij,ij->i", hist, (_LEVELS - mean[:, None]) ** 2) / n)
+    prob = hist / n[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        entropy = np.sum(np.where(prob > 0, prob * np.log(1 / prob), 0.0), axis=1) / np.log(2)
+    occupied = hist > 0
+    lo = occupied.argmax(axis=1)
+    hi = 255 - occupied[:, ::-1].argmax(axis=1)
+    return std, entropy, lo, hi
 
-    return {
-        "PSNR": psnr_val,
-        "SSIM": ssim_val,
-        "MSE": mse,
-        "Entropy": ent_val,
-        "CII": cii_val
-    }
+# SSIM for ReferenceMetrics: skimage's structural_similarity with the
+# defaults compute_metrics uses (7x7 uniform window, sample covariance,
+# K1=0.01, K2=0.03), on OpenCV box filters in float32. Values are centred
+# on 128 before the moments are taken, which keeps the float32 variances
+# within ~1e-7 of skimage's float64 result. The original's local mean and
+# variance are computed once per image; each candidate adds three box
+# filters (mean, mean of squares, cross term).
+#
+# ssim_step=n is the reduced mode for interactive use (SSIM_STEP sets the
+# default): the moments are still exact, but the SSIM map is evaluated and
+# averaged only at every n-th window centre in each direction. Measured on
+# the 16 filter outputs of 512px and 1024px fundus images, the absolute
+# error is below 1e-3 at step 2 and 5e-3 at step 4 (benchmark.py metrics
+# and tests/test_metrics.py check it). Downsampling the images instead is not an option: it
+# averages away the pixel noise that SSIM mostly measures here and moves
+# scores by up to 0.4.
+
+SSIM_WIN = 7
+SSIM_K1, SSIM_K2 = 0.01, 0.03
+SSIM_STEP = int(os.environ.get("SSIM_STEP", 1))
+
+def _ssim_input(img):
+    # Centred float32 copy
+    out = img.astype(np.float32)
+    out -= np.float32(128)
+    return out
+
+def _local_moments(x):
+    # Local mean and sample variance over the SSIM window
+    win = (SSIM_WIN, SSIM_WIN)
+    mean = cv2.boxFilter(x, -1, win, borderType=cv2.BORDER_REFLECT)
+    var = cv2.sqrBoxFilter(x, -1, win, borderType=cv2.BORDER_REFLECT)
+    var -= mean * mean
+    var *= np.float32(SSIM_WIN ** 2 / (SSIM_WIN ** 2 - 1))
+    return mean, var
+
+class ReferenceMetrics:
+    """
+    compute_metrics against one fixed original, for scoring many processed
+    images of it (the filter bank, parameter sweeps). The original's
+    statistics are computed once; each candidate then costs one 256-bin
+    histogram (Entropy, CII and the SSIM data range), one OpenCV L2 norm
+    (MSE, PSNR) and the candidate's side of SSIM. Results match
+    compute_metrics to floating point rounding (SSIM to ~1e-7) unless
+    ssim_step > 1.
+    """
+    def __init__(self, original, metrics=METRIC_NAMES, ssim_step=SSIM_STEP):
+        self.original = original
+        self.metrics = tuple(name for name in METRIC_NAMES if name in metrics)
+        self.std = float(histogram_stats(histogram_u8(original)[None])[0][0])
+        pad = (SSIM_WIN - 1) // 2
+        # Window centres SSIM is averaged over (skimage crops the border)
+        self._grid = (slice(pad, -pad, ssim_step), slice(pad, -pad, ssim_step))
+        if "SSIM" in self.metrics:
+            self._x = _ssim_input(original)
+            ux, vx = _local_moments(self._x)
+            self._ux, self._vx = ux[self._grid], vx[self._grid]
+
+    def ssim(self, processed, data_range):
+        y = _ssim_input(processed)
+        uy, vy = _local_moments(y)
+        y *= self._x
+        vxy = cv2.boxFilter(y, -1, (SSIM_WIN, SSIM_WIN), borderType=cv2.BORDER_REFLECT)
+        ux, vx = self._ux, self._vx
+        uy, vy, vxy = uy[self._grid], vy[self._grid], vxy[self._grid]
+        vxy = vxy - ux * uy
+        vxy *= np.float32(SSIM_WIN ** 2 / (SSIM_WIN ** 2 - 1))
+        # Back to uncentred means for the luminance term
+        ux, uy = ux + np.float32(128), uy + np.float32(128)
+        c1 = np.float32((SSIM_K1 * data_range) ** 2)
+        c2 = np.float32((SSIM_K2 * data_range) ** 2)
+        num = ux * uy
+        num *= 2
+        num += c1
+        vxy *= 2
+        vxy += c2
+        num *= vxy
+        den = ux * ux
+        den += uy * uy
+        den += c1
+        vx = vx + vy
+        vx += c2
+        den *= vx
+        num /= den
+        return float(num.mean(dtype=np.float64))
+
+    def __call__(self, processed):
+        if processed.shape != self.original.shape:
+            processed = cv2.resize(processed, (self.original.shape[1], self.original.shape[0]))
+        return self.evaluate_stack(processed[None])[0]
+
+    def evaluate_stack(self, stack):
+        """
+        Metrics for every image of an (N, H, W) stack of candidates, one
+        dict per image.
+        """
+        metrics = self.metrics
+        hist = np.stack([histogram_u8(p) for p in stack])
+        std, entropy, lo, hi = histogram_stats(hist)
+        results = []
+        for i, processed in enumerate(stack):
+            row = {}
+            if "MSE" in metrics or "PSNR" in metrics:
+                mse = cv2.norm(self.original, processed, cv2.NORM_L2SQR) / processed.size
+                row["MSE"] = mse
+                row["PSNR"] = 100 if mse == 0 else 20 * np.log10(255.0 / np.sqrt(mse))
+            if "SSIM" in metrics:
+                row["SSIM"] = self.ssim(processed, int(hi[i] - lo[i]))
+            if "Entropy" in metrics:
+                row["Entropy"] = float(entropy[i])
+            if "CII" in metrics:
+                row["CII"] = 0 if self.std == 0 else float(std[i]) / self.std
+            results.append({name: row[name] for name in metrics})
+        return results
 
 # =============================================================================
 # 2. IMAGE FILTERS IMPLEMENTATION
 # =============================================================================
 
+def cached_stage(stages, key, compute):
+    """
+    Intermediate shared between filters (see filter_stages.StageCache).
+    Computes directly when no stage cache is given.
+    """
+    return compute() if stages is None else stages.get(key, compute)
+
 # --- A. Spatial Domain Filters ---
 
-def filter_mean(img):
-    return cv2.blur(img, (5, 5))
+# Tunable parameters are keyword arguments; their defaults are the values
+# the filter bank uses (see filter_registry). Stage keys include them.
+
+def filter_mean(img, ksize=5):
+    return cv2.blur(img, (ksize, ksize))
+
+def filter_median(img, stages=None, ksize=5):
+    return cached_stage(stages, f"median{ksize}", lambda: cv2.medianBlur(img, ksize))
 
-def filter_median(img):
-    return cv2.medianBlur(img, 5)
+def filter_gaussian(img, ksize=5, sigma=0):
+    return cv2.GaussianBlur(img, (ksize, ksize), sigma)
 
-def filter_gaussian(img):
-    return cv2.GaussianBlur(img, (5, 5), 0)
+# Approximate bilateral filter for large images (Bilateral filter only).
+# scale=1 is the exact cv2.bilateralFilter. scale=n runs the bilateral
+# filter on a 1/n downsample (kernel shrunk to match) and brings the result
+# back to full resolution with a fast guided filter (He & Sun 2015) guided
+# by the full-resolution image, so edges stay sharp. Larger scale is
+# faster and coarser. Bound against the exact filter (9, 75, 75) on images
+# of 1024 px and more (BILATERAL_BOUNDS: PSNR / SSIM of at least 42 dB /
+# 0.98 at scale 2, 40 dB / 0.975 at 3, 38 dB / 0.97 at 4); benchmark.py
+# bilateral and tests/test_bilateral.py check it.
+# ACE-ME always uses the exact filter: its CLAHE step stretches the faint
+# texture the exact filter leaves in flat regions, so the approximation
+# cost about 12 dB there (33 dB / 0.85 SSIM at scale 2) while saving only
+# a quarter of ACE-ME's time.
+# BILATERAL_SCALE sets the default for the Bilateral filter.
 
-def filter_bilateral(img):
+BILATERAL_SCALE = int(os.environ.get("BILATERAL_SCALE", 1))
+BILATERAL_GUIDE_RADIUS = 1 # guided filter window (at the reduced size)
+BILATERAL_GUIDE_EPS = 100.0 # guided filter regulariser (grey levels squared)
+BILATERAL_BOUNDS = {2: (42.0, 0.98), 3: (40.0, 0.975), 4: (38.0, 0.97)} # scale: (PSNR, SSIM)
+BILATERAL_BOUND_MIN_DIM = 1024 # smaller images lose more detail to the downsample
+
+def bilateral_approx(img, d=9, sigma_color=75, sigma_space=75, scale=2):
+    """
+    Downsample - bilateral - guided upsample approximation of
+    cv2.bilateralFilter(img, d, sigma_color, sigma_space).
+    """
+    h, w = img.shape
+    small = cv2.resize(img, (-(-w // scale), -(-h // scale)), interpolation=cv2.INTER_AREA)
+    smooth = cv2.bilateralFilter(small, max(3, (d // scale) | 1), sigma_color, sigma_space / scale)
+
+    # Guided filter fit at the reduced size: smooth ~ a * small + b per window
+    guide = small.astype(np.float32)
+    target = smooth.astype(np.float32)
+    win = (2 * BILATERAL_GUIDE_RADIUS + 1,) * 2
+    mean_g = cv2.blur(guide, win)
+    mean_t = cv2.blur(target, win)
+    cov = cv2.blur(guide * target, win) - mean_g * mean_t
+    var = cv2.blur(guide * guide, win) - mean_g * mean_g
+    a = cov / (var + BILATERAL_GUIDE_EPS)
+    b = mean_t - a * mean_g
+    a = cv2.resize(cv2.blur(a, win), (w, h), interpolation=cv2.INTER_LINEAR)
+    b = cv2.resize(cv2.blur(b, win), (w, h), interpolation=cv2.INTER_LINEAR)
+    # a * img + b at full resolution, rounded and saturated to uint8
+    cv2.multiply(img, a, a, dtype=cv2.CV_32F)
+    return cv2.add(a, b, dtype=cv2.CV_8U)
+
+def filter_bilateral(img, stages=None, d=9, sigma_color=75, sigma_space=75, scale=BILATERAL_SCALE):
     # d=9, sigmaColor=75, sigmaSpace=75 are common defaults
-    return cv2.bilateralFilter(img, 9, 75, 75)
+    if scale == 1:
+        return cached_stage(stages, f"bilateral{d}_{sigma_color}_{sigma_space}",
+                            lambda: cv2.bilateralFilter(img, d, sigma_color, sigma_space))
+    return cached_stage(stages, f"bilateral{d}_{sigma_color}_{sigma_space}_x{scale}",
+                        lambda: bilateral_approx(img, d, sigma_color, sigma_space, scale))
 
 def filter_laplacian_sharpen(img):
     # Laplacian kernel
@@ -111,111 +318,381 @@ def filter_laplacian_sharpen(img):
     sharpened = cv2.filter2D(img, -1, kernel)
     return sharpened
 
-def filter_unsharp_masking(img):
-    gaussian = cv2.GaussianBlur(img, (9, 9), 10.0)
-    unsharp_image = cv2.addWeighted(img, 1.5, gaussian, -0.5, 0, img)
+def filter_unsharp_masking(img, ksize=9, sigma=10.0, amount=0.5):
+    gaussian = cv2.GaussianBlur(img, (ksize, ksize), sigma)
+    unsharp_image = cv2.addWeighted(img, 1.0 + amount, gaussian, -amount, 0)
     return unsharp_image
 
-def filter_clahe(img):
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    return clahe.apply(img)
+def filter_clahe(img, stages=None, clip_limit=2.0, tile_grid=8):
+    clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(tile_grid, tile_grid))
+    return cached_stage(stages, f"clahe{clip_limit}_{tile_grid}x{tile_grid}", lambda: clahe.apply(img))
 
 # --- B. Frequency Domain Filters (FFT) ---
+# The ideal/Gaussian filters share one real-input forward FFT per image
+# (through the stage cache) and take their masks from a cache keyed by
+# image shape, so each filter only pays for a mask multiply and an inverse.
+# The masks are radially symmetric, so the real-input transform gives the
+# same result as the full complex one.
+# These filters also accept a stack of images (N, H, W): the transforms run
+# over the last two axes and each image is normalised on its own.
+#
+# Filters on the filter and tile pools already run one per core, so those
+# pools start their threads with set_fft_workers(1) and each transform is
+# single-threaded by default rather than oversubscribing the cores
+# FILTER_THREADS times over.
 
-def apply_fft_filter(img, mask):
-    f = fft2(img)
-    fshift = fftshift(f)
-    fshift_filtered = fshift * mask
-    f_ishift = ifftshift(fshift_filtered)
-    img_back = ifft2(f_ishift)
-    img_back = np.abs(img_back)
-    return cv2.normalize(img_back, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
-
-def filter_ideal_lpf(img):
-    rows, cols = img.shape
-    crow, ccol = rows // 2, cols // 2
-    d = 60 # cutoff frequency
-    mask = np.zeros((rows, cols), np.uint8)
-    # Create a circle mask
-    y, x = np.ogrid[:rows, :cols]
-    mask_area = (x - ccol)**2 + (y - crow)**2 <= d**2
-    mask[mask_area] = 1
-    return apply_fft_filter(img, mask)
+FFT_WORKERS = int(os.environ.get("FFT_WORKERS", 0)) # 0: automatic, -1: all cores
+_fft_local = threading.local()
 
-def filter_gaussian_lpf(img):
-    rows, cols = img.shape
-    crow, ccol = rows // 2, cols // 2
-    d = 60
-    y, x = np.ogrid[:rows, :cols]
-    dist_sq = (x - ccol)**2 + (y - crow)**2
-    mask = np.exp(-dist_sq / (2 * (d**2)))
-    return apply_fft_filter(img, mask)
+def set_fft_workers(workers):
+    """
+    Thread-pool initializer: automatic transforms on this thread use workers threads.
+    """
+    _fft_local.workers = workers
 
-def filter_ideal_hpf(img):
-    rows, cols = img.shape
-    crow, ccol = rows // 2, cols // 2
-    d = 30
-    mask = np.ones((rows, cols), np.uint8)
-    y, x = np.ogrid[:rows, :cols]
-    mask_area = (x - ccol)**2 + (y - crow)**2 <= d**2
-    mask[mask_area] = 0
-    return apply_fft_filter(img, mask)
+def fft_workers():
+    if FFT_WORKERS:
+        return FFT_WORKERS
+    return getattr(_fft_local, "workers", -1)
 
-def filter_homomorphic(img):
-    # H(u,v) = (gamma_h - gamma_l) * [1 - exp(-c * (D^2 / D0^2))] + gamma_l
-    img_log = np.log1p(np.array(img, dtype="float"))
-    
-    rows, cols = img.shape
+def forward_rfft(img, stages=None):
+    return cached_stage(stages, "rfft2",
+                        lambda: sp_fft.rfft2(img.astype(np.float64), workers=fft_workers()))
+
+def normalize_minmax_u8(img):
+    """
+    Min-max normalisation to uint8, per image for a stack (N, H, W).
+    """
+    if img.ndim == 3:
+        return np.stack([normalize_minmax_u8(x) for x in img])
+    return cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+
+@lru_cache(maxsize=64)
+def frequency_mask(kind, shape, *params):
+    """
+    Centred radial mask ("ideal_lpf", "ideal_hpf", "gaussian_lpf" or
+    "homomorphic") moved to FFT order and cut to the half spectrum of rfft2.
+    """
+    rows, cols = shape
     crow, ccol = rows // 2, cols // 2
     y, x = np.ogrid[:rows, :cols]
     d_sq = (x - ccol)**2 + (y - crow)**2
     
-    d0 = 30
-    c = 1
-    gamma_h = 1.6
-    gamma_l = 0.5
+    if kind == "ideal_lpf":
+        d, = params
+        mask = (d_sq <= d**2).astype(np.float64)
+    elif kind == "ideal_hpf":
+        d, = params
+        mask = (d_sq > d**2).astype(np.float64)
+    elif kind == "gaussian_lpf":
+        d, = params
+        mask = np.exp(-d_sq / (2 * (d**2)))
+    elif kind == "homomorphic":
+        # H(u,v) = (gamma_h - gamma_l) * [1 - exp(-c * (D^2 / D0^2))] + gamma_l
+        d0, c, gamma_h, gamma_l = params
+        mask = (gamma_h - gamma_l) * (1 - np.exp(-c * (d_sq / (d0**2)))) + gamma_l
+    else:
+        raise ValueError(f"Unknown frequency mask: {kind}")
+    
+    mask = np.ascontiguousarray(np.fft.ifftshift(mask)[:, :cols // 2 + 1])
+    mask.flags.writeable = False
+    return mask
+
+def inverse_rfft(spectrum, shape):
+    return sp_fft.irfft2(spectrum, s=shape[-2:], workers=fft_workers())
+
+def apply_fft_filter(img, mask, stages=None):
+    """
+    Filters img with a half-spectrum mask from frequency_mask.
+    """
+    img_back = np.abs(inverse_rfft(forward_rfft(img, stages) * mask, img.shape))
+    return normalize_minmax_u8(img_back)
+
+def filter_ideal_lpf(img, stages=None, cutoff=60):
+    return apply_fft_filter(img, frequency_mask("ideal_lpf", img.shape[-2:], cutoff), stages)
+
+def filter_gaussian_lpf(img, stages=None, cutoff=60):
+    return apply_fft_filter(img, frequency_mask("gaussian_lpf", img.shape[-2:], cutoff), stages)
+
+def filter_ideal_hpf(img, stages=None, cutoff=30):
+    return apply_fft_filter(img, frequency_mask("ideal_hpf", img.shape[-2:], cutoff), stages)
+
+def filter_homomorphic(img, d0=30, c=1, gamma_h=1.6, gamma_l=0.5):
+    img_log = np.log1p(np.array(img, dtype="float"))
     
-    H = (gamma_h - gamma_l) * (1 - np.exp(-c * (d_sq / (d0**2)))) + gamma_l
+    H = frequency_mask("homomorphic", img.shape[-2:], d0, c, gamma_h, gamma_l)
     
-    f = fft2(img_log)
-    fshift = fftshift(f)
-    fshift_filtered = fshift * H
-    f_ishift = ifftshift(fshift_filtered)
-    img_back_log = np.real(ifft2(f_ishift))
+    img_back_log = inverse_rfft(sp_fft.rfft2(img_log, workers=fft_workers()) * H, img.shape)
     img_back = np.expm1(img_back_log)
     
-    return cv2.normalize(img_back, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+    return normalize_minmax_u8(img_back)
 
 # --- C. Hybrid / Combination Filters ---
 
-def filter_median_gamma(img):
-    med = cv2.medianBlur(img, 5)
-    gamma = 1.2
+def gamma_table(gamma):
+    """
+    256-entry LUT for gamma correction: out = 255 * (in / 255) ** (1 / gamma).
+    """
+    return ((np.arange(256) / 255.0) ** (1.0 / gamma) * 255).astype(np.uint8)
+
+def filter_median_gamma(img, stages=None, ksize=5, gamma=1.2):
+    med = filter_median(img, stages, ksize)
     # Apply gamma correction
-    inv_gamma = 1.0 / gamma
-    table = np.array([((i / 255.0) ** inv_gamma) * 255
-                      for i in np.arange(0, 256)]).astype("uint8")
-    return cv2.LUT(med, table)
+    return cv2.LUT(med, gamma_table(gamma))
 
-def filter_median_laplacian(img):
-    med = cv2.medianBlur(img, 5)
+def filter_median_laplacian(img, stages=None, ksize=5):
+    med = filter_median(img, stages, ksize)
     return filter_laplacian_sharpen(med)
 
-def filter_clahe_wavelet(img):
-    cl = filter_clahe(img)
-    # Wavelet denoising using Scikit-image (BayesShrink typically)
-    # Using Soft thresholding
-    from skimage.restoration import denoise_wavelet
-    # denoise_wavelet expects result in float [0,1] or same as input.
-    # We pass it our uint8, it returns float.
-    res_float = denoise_wavelet(cl, method='BayesShrink', mode='soft', rescale_sigma=True)
+# Wavelet denoising for CLAHE_Wavelet. denoise_wavelet_haar is a float32
+# version of skimage's denoise_wavelet(img, method='BayesShrink',
+# mode='soft', rescale_sigma=True) with its default db1 (Haar) wavelet and
+# level count. Haar coefficients do not overlap, so the image is cut into
+# horizontal bands aligned to 2**levels rows and each band is decomposed,
+# thresholded and reconstructed on its own (in parallel for large images);
+# only the BayesShrink statistics are pooled over the bands. The result
+# equals the whole-image transform.
+
+WAVELET_THREADS = int(os.environ.get("WAVELET_THREADS", min(4, os.cpu_count() or 1)))
+WAVELET_BAND_MIN_PIXELS = 1 << 20 # smaller images run in one band
+
+_wavelet_pool = None
+_wavelet_pool_lock = threading.Lock()
+
+def _get_wavelet_pool():
+    global _wavelet_pool
+    with _wavelet_pool_lock:
+        if _wavelet_pool is None and WAVELET_THREADS > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            _wavelet_pool = ThreadPoolExecutor(max_workers=WAVELET_THREADS, thread_name_prefix="wavelet")
+    return _wavelet_pool
+
+@lru_cache(maxsize=32)
+def haar_plan(shape, bands=1):
+    """
+    (levels, row ranges) for an image of shape: skimage's level count
+    (pywt max level - 3, at least 1) and up to bands row ranges whose
+    boundaries are multiples of 2**levels.
+    """
+    levels = max(int(np.floor(np.log2(max(min(shape), 1)))) - 3, 1)
+    block = 1 << levels
+    step = -(-shape[0] // (bands * block)) * block
+    rows = tuple((start, min(start + step, shape[0])) for start in range(0, shape[0], step))
+    return levels, rows
+
+def _haar_forward(x):
+    # One 2-D Haar level; odd sizes get pywt's symmetric extension (the last
+    # row/column repeated). Returns (approx, (ad, da, dd)).
+    if x.shape[0] % 2:
+        x = np.concatenate([x, x[-1:]], axis=0)
+    if x.shape[1] % 2:
+        x = np.concatenate([x, x[:, -1:]], axis=1)
+    lo = x[0::2] + x[1::2]
+    hi = x[0::2] - x[1::2]
+    half = np.float32(0.5)
+    return ((lo[:, 0::2] + lo[:, 1::2]) * half,
+            ((lo[:, 0::2] - lo[:, 1::2]) * half,
+             (hi[:, 0::2] + hi[:, 1::2]) * half,
+             (hi[:, 0::2] - hi[:, 1::2]) * half))
+
+def _haar_inverse(approx, details, shape):
+    ad, da, dd = details
+    h, w = approx.shape
+    lo = np.empty((h, 2 * w), np.float32)
+    hi = np.empty((h, 2 * w), np.float32)
+    lo[:, 0::2], lo[:, 1::2] = approx + ad, approx - ad
+    hi[:, 0::2], hi[:, 1::2] = da + dd, da - dd
+    x = np.empty((2 * h, 2 * w), np.float32)
+    np.add(lo, hi, out=x[0::2])
+    np.subtract(lo, hi, out=x[1::2])
+    x *= np.float32(0.5)
+    return x[:shape[0], :shape[1]]
+
+def _haar_noise_band(img):
+    # Finest diagonal detail in float64 with pywt's operation order (rows,
+    # then columns), only for the noise estimate: float32 turns coefficients
+    # that skimage sees as ~1e-17 into exact zeros, which the median drops
+    x = img * (1.0 / 255)
+    if x.shape[0] % 2:
+        x = np.concatenate([x, x[-1:]], axis=0)
+    if x.shape[1] % 2:
+        x = np.concatenate([x, x[:, -1:]], axis=1)
+    h = np.sqrt(0.5)
+    hi = x[0::2] * h - x[1::2] * h
+    return hi[:, 0::2] * h - hi[:, 1::2] * h
+
+def _haar_decompose(x, levels):
+    shapes, details = [], []
+    for _ in range(levels):
+        shapes.append(x.shape)
+        x, level = _haar_forward(x)
+        details.append(level)  # finest first
+    return x, details, shapes
+
+def _haar_shrink_reconstruct(approx, details, shapes, thresholds):
+    for level, shape, level_thresh in reversed(list(zip(details, shapes, thresholds))):
+        shrunk = []
+        for d, t in zip(level, level_thresh):
+            # soft threshold: sign(d) * max(|d| - t, 0)
+            mag = np.abs(d)
+            mag -= np.float32(t)
+            np.maximum(mag, 0, out=mag)
+            shrunk.append(np.copysign(mag, d, out=mag))
+        approx = _haar_inverse(approx, shrunk, shape)
+    return approx
+
+def denoise_wavelet_haar(img):
+    """
+    BayesShrink soft-threshold Haar denoising of a uint8 image; returns
+    float32 in [0, 1], like skimage's denoise_wavelet with default settings.
+    """
+    x = img.astype(np.float32) * np.float32(1.0 / 255)
+    pool = _get_wavelet_pool() if img.size >= WAVELET_BAND_MIN_PIXELS else None
+    levels, rows = haar_plan(img.shape, WAVELET_THREADS if pool is not None else 1)
+    run = (lambda fn, items: list(pool.map(fn, items))) if pool is not None else \
+          (lambda fn, items: [fn(item) for item in items])
+    
+    parts = run(lambda r: _haar_decompose(x[r[0]:r[1]], levels), rows)
+
+    # Noise sigma: median absolute finest diagonal detail (zeros masked out)
+    finest = np.concatenate(run(lambda r: _haar_noise_band(img[r[0]:r[1]]).ravel(), rows))
+    finest = np.abs(finest[finest != 0])
+    sigma = float(np.median(finest)) / 0.6744897501960817 if finest.size else 0.0
+    var = sigma ** 2
+    eps = np.finfo(np.float64).eps
+
+    # BayesShrink threshold per level and band: var / sqrt(max(E[d^2] - var, eps))
+    thresholds = []
+    for k in range(levels):
+        level_thresh = []
+        for j in range(3):
+            sq = sum(float(np.dot(p[1][k][j].ravel(), p[1][k][j].ravel())) for p in parts)
+            count = sum(p[1][k][j].size for p in parts)
+            level_thresh.append(var / np.sqrt(max(sq / count - var, eps)))
+        thresholds.append(level_thresh)
+
+    out = np.empty_like(x)
+    def reconstruct(item):
+        (start, stop), (approx, details, shapes) = item
+        out[start:stop] = _haar_shrink_reconstruct(approx, details, shapes, thresholds)
+    run(reconstruct, list(zip(rows, parts)))
+    return np.clip(out, 0, 1, out=out)
+
+def filter_clahe_wavelet(img, stages=None, clip_limit=2.0, denoiser="haar"):
+    """
+    CLAHE followed by wavelet denoising. denoiser is "haar" (float32, see
+    denoise_wavelet_haar) or "skimage" (the original float64 path).
+    """
+    cl = filter_clahe(img, stages, clip_limit)
+    if denoiser == "haar":
+        res_float = denoise_wavelet_haar(cl)
+    elif denoiser == "skimage":
+        # Wavelet denoising using Scikit-image (BayesShrink typically)
+        # Using Soft thresholding
+        from skimage.restoration import denoise_wavelet
+        # denoise_wavelet expects result in float [0,1] or same as input.
+        # We pass it our uint8, it returns float.
+        res_float = denoise_wavelet(cl, method='BayesShrink', mode='soft', rescale_sigma=True)
+    else:
+        raise ValueError(f"Unknown denoiser: {denoiser}")
     res_uint8 = cv2.normalize(res_float, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
     return res_uint8
 
 # --- D. NOVEL FILTER: ACE-ME ---
 
-def filter_ace_me_novel(img):
+# Per-thread work buffers for filter_ace_me_novel, reallocated only when the
+# image shape changes. Each thread keeps one set (~6 bytes/pixel of uint8 and
+# 16 bytes/pixel of float32) plus its own CLAHE object, for images of up to
+# ACE_ME_CACHE_PIXELS (the resized images and full-resolution tiles); larger
+# images get buffers for that call only, so a single full-size request does
+# not leave hundreds of MB pinned to every pool thread.
+ACE_ME_CACHE_PIXELS = int(os.environ.get("ACE_ME_CACHE_PIXELS", 1024 * 1024))
+_ace_me_local = threading.local()
+
+def _ace_me_buffers(shape):
+    bufs = getattr(_ace_me_local, "buffers", None)
+    if bufs is None or bufs["shape"] != shape:
+        bufs = {
+            "shape": shape,
+            "clahe": cv2.createCLAHE(clipLimit=2.5, tileGridSize=(8, 8)),
+            "fine": np.empty(shape, np.uint8),
+            "mid": np.empty(shape, np.uint8),
+            "sharp": np.empty(shape, np.uint8),
+            "gx": np.empty(shape, np.float32),
+            "gy": np.empty(shape, np.float32),
+            "enh": np.empty(shape, np.float32),
+            "diff": np.empty(shape, np.float32),
+        }
+        # Over the cap the cached set is dropped too, not just left unreplaced
+        _ace_me_local.buffers = bufs if shape[0] * shape[1] <= ACE_ME_CACHE_PIXELS else None
+    return bufs
+
+def ace_me_gamma_table(mu):
+    """
+    Dynamic gamma LUT that moves the mean intensity mu (0-1) towards 0.5.
+    """
+    # Avoid log(0); clip gamma to avoid extreme values
+    mu = np.clip(mu, 0.01, 0.99)
+    return gamma_table(np.clip(np.log(0.5) / np.log(mu), 0.5, 2.0))
+
+def filter_ace_me_novel(img, stages=None, clip_limit=2.5):
+    """
+    ACE-ME: Adaptive Contrast Enhancement with Multi-scale Edge Fusion
+    1. Edge-preserving denoising (Bilateral)
+    2. Multi-scale Unsharp Masking
+    3. CLAHE
+    4. Dynamic Gamma Correction
+    5. Edge-guided Fusion (Sobel)
+    
+    Same steps as filter_ace_me_reference, written into per-thread buffers
+    with float32 gradients. Output is within 1 grey level of the reference.
+    The bilateral step is always exact (see bilateral_approx).
+    """
+    b = _ace_me_buffers(img.shape)
+    
+    # 1. Edge-preserving denoising (shared with filter_bilateral)
+    denoised = filter_bilateral(img, stages, scale=1)
+    
+    # 2. Multi-scale Unsharp Masking (saturating uint8, as in the reference)
+    fine, mid, sharp = b["fine"], b["mid"], b["sharp"]
+    cv2.GaussianBlur(denoised, (5, 5), 1.0, dst=fine)
+    cv2.subtract(denoised, fine, dst=fine)
+    cv2.GaussianBlur(denoised, (9, 9), 2.0, dst=mid)
+    cv2.subtract(denoised, mid, dst=mid)
+    cv2.addWeighted(denoised, 1.0, fine, 0.8, 0, dst=sharp)
+    cv2.addWeighted(sharp, 1.0, mid, 0.5, 0, dst=sharp)
+    
+    # 3. CLAHE (into the free fine-detail buffer)
+    b["clahe"].setClipLimit(clip_limit)
+    enhanced = b["clahe"].apply(sharp, fine)
+    
+    # 4. Dynamic Gamma Correction
+    table = ace_me_gamma_table(cv2.mean(enhanced)[0] / 255.0)
+    cv2.LUT(enhanced, table, dst=mid)
+    
+    # 5. Edge-guided Fusion
+    # alpha = 1 - 0.3 * mag_norm, so
+    # out = alpha * gamma + (1 - alpha) * denoised = gamma - 0.3 * mag_norm * (gamma - denoised)
+    gx, gy = b["gx"], b["gy"]
+    cv2.Sobel(denoised, cv2.CV_32F, 1, 0, dst=gx, ksize=3)
+    cv2.Sobel(denoised, cv2.CV_32F, 0, 1, dst=gy, ksize=3)
+    cv2.magnitude(gx, gy, gx)
+    cv2.normalize(gx, gx, 0, 0.3, cv2.NORM_MINMAX)
+    
+    enh, diff = b["enh"], b["diff"]
+    np.copyto(enh, mid)
+    np.subtract(enh, denoised, out=diff)
+    np.multiply(diff, gx, out=diff)
+    np.subtract(enh, diff, out=enh)
+    np.clip(enh, 0, 255, out=enh)
+    
+    return enh.astype(np.uint8)
+
+def filter_ace_me_reference(img, stages=None):
     """
+    Original (unfused) ACE-ME, kept as the reference for filter_ace_me_novel.
+    Checked against it in tests/test_ace_me.py (timing: benchmark.py ace-me).
+
     ACE-ME: Adaptive Contrast Enhancement with Multi-scale Edge Fusion
     1. Edge-preserving denoising (Bilateral)
     2. Multi-scale Unsharp Masking
@@ -223,8 +700,8 @@ def filter_ace_me_novel(img):
     4. Dynamic Gamma Correction
     5. Edge-guided Fusion (Sobel)
     """
-    # 1. Edge-preserving denoising
-    denoised = cv2.bilateralFilter(img, 9, 75, 75)
+    # 1. Edge-preserving denoising (shared with filter_bilateral)
+    denoised = filter_bilateral(img, stages, scale=1)
     
     # 2. Multi-scale Unsharp Masking
     # Fine details
@@ -316,25 +793,9 @@ def main():
         original_img = dummy.astype(np.uint8)
         img_path = "Synthetic_Demo"
 
-    # Define Filters
-    filters = {
-        "Original": lambda x: x, # Baseline
-        "Mean Filter": filter_mean,
-        "Median Filter": filter_median,
-        "Gaussian Smooth": filter_gaussian,
-        "Bilateral": filter_bilateral,
-        "Laplacian": filter_laplacian_sharpen,
-        "Unsharp Mask": filter_unsharp_masking,
-        "CLAHE": filter_clahe,
-        "Ideal LPF": filter_ideal_lpf,
-        "Gaussian LPF": filter_gaussian_lpf,
-        "Ideal HPF": filter_ideal_hpf,
-        "Homomorphic": filter_homomorphic,
-        "Median + Gamma": filter_median_gamma,
-        "Median + Laplacian": filter_median_laplacian,
-        "CLAHE + Wavelet": filter_clahe_wavelet,
-        "ACE-ME (Novel)": filter_ace_me_novel
-    }
+    # Filters come from the shared registry, keyed by display label
+    from filter_registry import FILTERS
+    filters = {spec.label: spec for spec in FILTERS.values()}
     
     results_metrics = []
     processed_images = {}
@@ -0,0 +1,198 @@
+import os
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from skimage.metrics import structural_similarity as ssim
+import filters
+from filters import FILTERS, METRIC_NAMES, apply_filter, failed_metrics, filters_by_cost
+import filter_test
+from filter_test import compute_metrics
+from filter_stages import StageCache
+
+# ==============================
+# FULL-RESOLUTION (TILED) MODE
+# ==============================
+# The normal path shrinks images to MAX_DIM. In full-resolution mode local
+# filters run on overlapping tiles instead: each tile is cut with a halo at
+# least as wide as the filter's kernel radius, filtered, and only its core
+# is written to the output, so the result matches a whole-image run pixel
+# for pixel while the working set scales with the tile size. Tiles of one
+# filter run in parallel; filters run one after another.
+#
+# Filters that depend on the whole image (registered without a halo)
+# cannot be tiled and run on the full image instead (whole-image fallback):
+#   - CLAHE / CLAHE_Wavelet: the 8x8 tile grid and the wavelet noise
+#     estimate are relative to the whole image
+#   - Ideal_LPF, Gaussian_LPF, Ideal_HPF, Homomorphic: global FFT, plus a
+#     min-max normalisation over the whole result
+#   - ACE_ME_Novel: global mean (gamma) and min-max edge normalisation
+# Their memory still grows with the image (roughly 8x the pixel count for
+# the FFT filters), but only one of them runs at a time.
+#
+# Metrics are accumulated over tiles as well (sums, histograms and SSIM map
+# sums), which gives the same values as compute_metrics on the whole image.
+
+DEFAULT_TILE_SIZE = 512
+TILE_SIZE = int(os.environ.get("FILTER_TILE_SIZE", DEFAULT_TILE_SIZE))
+
+# skimage SSIM: 7x7 window, (7-1)//2 pixels cropped at the image border
+SSIM_HALO = 3
+
+_tile_pool = None
+_tile_pool_lock = threading.Lock()
+
+def _get_tile_pool():
+    global _tile_pool
+    with _tile_pool_lock:
+        if _tile_pool is None and filters.FILTER_THREADS > 1:
+            _tile_pool = ThreadPoolExecutor(max_workers=filters.FILTER_THREADS, thread_name_prefix="tile",
+                                            initializer=filter_test.set_fft_workers, initargs=(1,))
+    return _tile_pool
+
+def _map_tiles(fn, tiles):
+    pool = _get_tile_pool()
+    if pool is None:
+        return [fn(t) for t in tiles]
+    return list(pool.map(fn, tiles))
+
+def _bounds(length, tile_size):
+    # Even split, so the last tile is never a thin sliver
+    count = max(1, -(-length // tile_size))
+    return np.linspace(0, length, count + 1).astype(int)
+
+def tile_slices(shape, tile_size, halo):
+    """
+    Returns (source, core, target) slice pairs covering an image of shape:
+    source is the tile with its halo, core the part of the filtered tile to
+    keep, and target where that core goes in the output.
+    """
+    h, w = shape
+    ys, xs = _bounds(h, tile_size), _bounds(w, tile_size)
+    tiles = []
+    for y0, y1 in zip(ys[:-1], ys[1:]):
+        for x0, x1 in zip(xs[:-1], xs[1:]):
+            sy0, sx0 = max(0, y0 - halo), max(0, x0 - halo)
+            sy1, sx1 = min(h, y1 + halo), min(w, x1 + halo)
+            tiles.append((
+                (slice(sy0, sy1), slice(sx0, sx1)),
+                (slice(y0 - sy0, y1 - sy0), slice(x0 - sx0, x1 - sx0)),
+                (slice(y0, y1), slice(x0, x1)),
+            ))
+    return tiles
+
+def is_tiled(name, img, tile_size=TILE_SIZE):
+    return FILTERS[name].halo is not None and max(img.shape) > tile_size
+
+def apply_filter_tiled(name, img, stages=None, tile_size=TILE_SIZE):
+    """
+    Returns the processed image for one filter at full resolution, tiled
+    when the filter allows it and whole-image otherwise.
+    """
+    if not is_tiled(name, img, tile_size):
+        return apply_filter(name, img, stages)
+
+    out = np.empty_like(img)
+
+    def run_tile(tile):
+        source, core, target = tile
+        # Shared stages are per image, not per tile
+        out[target] = apply_filter(name, img[source])[core]
+
+    _map_tiles(run_tile, tile_slices(img.shape, tile_size, FILTERS[name].halo))
+    return out
+
+# ==============================
+# TILED METRICS
+# ==============================
+def tiled_metrics(original, processed, metrics=METRIC_NAMES, tile_size=TILE_SIZE):
+    """
+    compute_metrics for large images, accumulated tile by tile.
+    """
+    h, w = original.shape
+    if max(h, w) <= tile_size:
+        return compute_metrics(original, processed, metrics)
+
+    need_ssim = "SSIM" in metrics
+    data_range = float(processed.max()) - float(processed.min())
+
+    def run_tile(tile):
+        source, core, target = tile
+        part = {}
+        o, p = original[target], processed[target]
+        if "MSE" in metrics or "PSNR" in metrics:
+            d = o.astype(np.int64) - p
+            part["sq_err"] = int(np.dot(d.ravel(), d.ravel()))
+        if "Entropy" in metrics:
+            part["hist"] = np.bincount(p.ravel(), minlength=256)
+        if "CII" in metrics:
+            o64, p64 = o.astype(np.int64), p.astype(np.int64)
+            part["o_sum"], part["o_sq"] = int(o64.sum()), int((o64 * o64).sum())
+            part["p_sum"], part["p_sq"] = int(p64.sum()), int((p64 * p64).sum())
+        if need_ssim:
+            _, s_map = ssim(original[source], processed[source], data_range=data_range, full=True)
+            # Keep the core, minus the border skimage crops from the whole image
+            y0 = max(target[0].start, SSIM_HALO) - target[0].start + core[0].start
+            y1 = min(target[0].stop, h - SSIM_HALO) - target[0].start + core[0].start
+            x0 = max(target[1].start, SSIM_HALO) - target[1].start + core[1].start
+            x1 = min(target[1].stop, w - SSIM_HALO) - target[1].start + core[1].start
+            valid = s_map[y0:y1, x0:x1]
+            part["ssim_sum"], part["ssim_n"] = float(valid.sum(dtype=np.float64)), valid.size
+        return part
+
+    parts = _map_tiles(run_tile, tile_slices(original.shape, tile_size, SSIM_HALO if need_ssim else 0))
+    total = lambda key: sum(part[key] for part in parts)
+    n = h * w
+    results = {}
+
+    if "MSE" in metrics or "PSNR" in metrics:
+        mse = total("sq_err") / n
+        results["MSE"] = mse
+        results["PSNR"] = 100 if mse == 0 else 20 * np.log10(255.0 / np.sqrt(mse))
+
+    if need_ssim:
+        results["SSIM"] = total("ssim_sum") / total("ssim_n")
+
+    if "Entropy" in metrics:
+        hist = total("hist")
+        prob = hist[hist > 0] / n
+        results["Entropy"] = float(-np.sum(prob * np.log2(prob)))
+
+    if "CII" in metrics:
+        std = lambda s, sq: np.sqrt(max(0.0, sq / n - (s / n) ** 2))
+        cont_orig = std(total("o_sum"), total("o_sq"))
+        cont_proc = std(total("p_sum"), total("p_sq"))
+        results["CII"] = 0 if cont_orig == 0 else cont_proc / cont_orig
+
+    return {name: results[name] for name in METRIC_NAMES if name in metrics}
+
+# ==============================
+# FILTER BANK
+# ==============================
+def iter_filters_full_resolution(img, names=None, metrics=METRIC_NAMES, tile_size=TILE_SIZE):
+    """
+    Same contract as filters.iter_filters_parallel, at full resolution: yields
+    (name, processed, metrics, error), one filter at a time (cheapest first)
+    with its tiles in parallel.
+    """
+    names = list(FILTERS) if names is None else list(names)
+    # Shared by the whole-image filters (FFT, bilateral, CLAHE)
+    stages = StageCache()
+    for name in filters_by_cost(names):
+        try:
+            processed = apply_filter_tiled(name, img, stages, tile_size)
+            yield name, processed, tiled_metrics(img, processed, metrics, tile_size), None
+        except Exception as e:
+            yield name, None, None, e
+
+def apply_filters_full_resolution(img, names=None, metrics=METRIC_NAMES, tile_size=TILE_SIZE):
+    """
+    filters.apply_filters_to_array without resizing the input.
+    """
+    results = {}
+    for name, processed, computed, error in iter_filters_full_resolution(img, names, metrics, tile_size):
+        if error is not None:
+            print(f"Filter {name} failed: {error}")
+            results[name] = {"metrics": failed_metrics(metrics), "image": img}
+        else:
+            results[name] = {"metrics": computed, "image": processed}
+    return {name: results[name] for name in FILTERS if name in results}
@@ -1,78 +1,231 @@
-from filter_test import (
-    filter_mean,
-    filter_median,
-    filter_gaussian,
-    filter_bilateral,
-    filter_laplacian_sharpen,
-    filter_unsharp_masking,
-    filter_clahe,
-    filter_ideal_lpf,
-    filter_gaussian_lpf,
-    filter_ideal_hpf,
-    filter_homomorphic,
-    filter_median_gamma,
-    filter_median_laplacian,
-    filter_clahe_wavelet,
-    filter_ace_me_novel,
-    compute_metrics
-)
+from filter_test import METRIC_NAMES, ReferenceMetrics
 import cv2
 import numpy as np
+import os
+import hashlib
+import inspect
+import threading
+import types
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import filter_test
+from filter_registry import FILTERS
+from filter_stages import StageCache
 
-def apply_all_filters(image_path):
-    img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-    
-    if img is None:
-        raise ValueError(f"Could not read image at {image_path}")
+MAX_DIM = 512
+
+FAILED_METRICS = {"PSNR": 0, "SSIM": 0, "MSE": 0, "Entropy": 0, "CII": 0}
 
+def resize_for_filters(img, max_dim=MAX_DIM):
     # Resize for performance (Limit max dimension to 512)
     h, w = img.shape
-    max_dim = 512
     if max(h, w) > max_dim:
         scale = max_dim / max(h, w)
         new_w = int(w * scale)
         new_h = int(h * scale)
         img = cv2.resize(img, (new_w, new_h))
+    return img
+
+def filters_by_cost(names=None, reverse=False):
+    names = list(FILTERS) if names is None else list(names)
+    return sorted(names, key=lambda n: FILTERS[n].cost, reverse=reverse)
+
+# ==============================
+# VERSION FINGERPRINTS
+# ==============================
+_fingerprints = {}
+
+def _global_names(code):
+    # Globals referenced by code, including from nested functions and lambdas
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _global_names(const)
+    return names
+
+def _collect_sources(func, seen):
+    # Source of func (a function or class) plus every filter_test helper it
+    # calls, so editing a shared helper (e.g. apply_fft_filter) changes the
+    # fingerprint too.
+    if func in seen:
+        return []
+    seen.add(func)
+    sources = [inspect.getsource(func)]
+    methods = [m for m in vars(func).values() if isinstance(m, types.FunctionType)] \
+        if isinstance(func, type) else [func]
+    for method in methods:
+        for name in sorted(_global_names(method.__code__)):
+            ref = method.__globals__.get(name)
+            ref = getattr(ref, "__wrapped__", ref) # see through lru_cache
+            if isinstance(ref, (types.FunctionType, type)) and ref.__module__ == filter_test.__name__:
+                sources.extend(_collect_sources(ref, seen))
+    return sources
+
+def filter_fingerprint(name):
+    """
+    Short hash of a filter's code, registered params and the metrics engine.
+    Changes whenever the filter, a helper it calls, or the metrics change.
+    """
+    if name not in _fingerprints:
+        spec = FILTERS[name]
+        sources = _collect_sources(spec.func, set()) + _collect_sources(ReferenceMetrics, set())
+        sources.append(repr(sorted(spec.params.items())))
+        sources.append(f"ssim_step={filter_test.SSIM_STEP}")
+        digest = hashlib.sha256("\n".join(sources).encode("utf-8"))
+        digest.update(cv2.__version__.encode("utf-8"))
+        _fingerprints[name] = digest.hexdigest()[:12]
+    return _fingerprints[name]
 
+# ==============================
+# APPLY
+# ==============================
+def failed_metrics(metrics=METRIC_NAMES):
+    return {name: FAILED_METRICS[name] for name in METRIC_NAMES if name in metrics}
+
+def apply_filter(name, img, stages=None):
+    """
+    Returns the processed image for one filter, same size as img.
+    stages is an optional StageCache shared by the filters of one image.
+    """
+    processed = FILTERS[name](img, stages)
+    # Ensure processed is same size/type as img
+    if processed.shape != img.shape:
+        processed = cv2.resize(processed, (img.shape[1], img.shape[0]))
+    return processed
+
+def run_filter(name, img, metrics=METRIC_NAMES, stages=None, reference=None):
+    """
+    Returns (processed, metrics) for one filter. Raises if the filter fails.
+    reference is the image's ReferenceMetrics, shared by all its filters.
+    """
+    processed = apply_filter(name, img, stages)
+    reference = ReferenceMetrics(img, metrics) if reference is None else reference
+    return processed, reference(processed)
+
+def apply_all_filters(image_path, full_resolution=False):
+    """
+    Runs the filter bank on an image file, resized to MAX_DIM unless
+    full_resolution is set (tiled, see filter_tiles).
+    """
+    img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    
+    if img is None:
+        raise ValueError(f"Could not read image at {image_path}")
+
+    if full_resolution:
+        from filter_tiles import apply_filters_full_resolution
+        return apply_filters_full_resolution(img)
+    return apply_filters_to_array(resize_for_filters(img))
+
+def apply_filters_to_array(img, names=None, metrics=METRIC_NAMES, stages=None):
+    """
+    Runs the filter bank on an already decoded and resized grayscale image.
+    Filters run on the shared worker pools (see below); results come back in
+    FILTERS order regardless of completion order. Pass a StageCache as
+    stages to inspect which intermediates were shared afterwards.
+    """
+    names = list(FILTERS) if names is None else list(names)
     results = {}
-    filters = {
-        "Original": lambda x: x,
-        "Mean": filter_mean,
-        "Median": filter_median,
-        "Gaussian": filter_gaussian,
-        "Bilateral": filter_bilateral,
-        "Laplacian": filter_laplacian_sharpen,
-        "Unsharp_Mask": filter_unsharp_masking, # Fixed key name
-        "CLAHE": filter_clahe,
-        "Ideal_LPF": filter_ideal_lpf,
-        "Gaussian_LPF": filter_gaussian_lpf,
-        "Ideal_HPF": filter_ideal_hpf,
-        "Homomorphic": filter_homomorphic,
-        "Median_Gamma": filter_median_gamma,
-        "Median_Laplacian": filter_median_laplacian,
-        "CLAHE_Wavelet": filter_clahe_wavelet,
-        "ACE_ME_Novel": filter_ace_me_novel
-    }
-
-    for name, func in filters.items():
-        try:
-            processed = func(img)
-            # Ensure processed is same size/type as img
-            if processed.shape != img.shape:
-                processed = cv2.resize(processed, (img.shape[1], img.shape[0]))
-                
-            metrics = compute_metrics(img, processed)
-            
-            results[name] = {
-                "metrics": metrics,
-                "image": processed
-            }
-        except Exception as e:
-            print(f"Filter {name} failed: {e}")
+    for name, processed, computed, error in iter_filters_parallel(img, names, metrics, stages):
+        if error is not None:
+            print(f"Filter {name} failed: {error}")
             # Fallback to original if filter fails
             results[name] = {
-                "metrics": {"PSNR": 0, "SSIM": 0, "MSE": 0, "Entropy": 0, "CII": 0},
+                "metrics": failed_metrics(metrics),
                 "image": img
             }
+        else:
+            results[name] = {
+                "metrics": computed,
+                "image": processed
+            }
+
+    return {name: results[name] for name in FILTERS if name in results}
+
+# ==============================
+# PARALLEL EXECUTION
+# ==============================
+# Most filters are OpenCV/NumPy kernels that release the GIL, so they run on
+# a thread pool. Filters registered with releases_gil=False (Python-level
+# work that holds the GIL) run on a small process pool instead. Work is
+# submitted most expensive first (registry cost) so the slowest filter
+# starts immediately and the rest fill in around it. The process pool is
+# opt-in (FILTER_PROCESSES=0 by default runs those filters on the thread
+# pool too); FILTER_THREADS=1 runs the thread-pool filters serially.
+
+FILTER_THREADS = int(os.environ.get("FILTER_THREADS", min(8, os.cpu_count() or 1)))
+FILTER_PROCESSES = int(os.environ.get("FILTER_PROCESSES", 0))
 
-    return results
+_thread_pool = None
+_process_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pools():
+    global _thread_pool, _process_pool
+    with _pool_lock:
+        if _thread_pool is None and FILTER_THREADS > 1:
+            _thread_pool = ThreadPoolExecutor(max_workers=FILTER_THREADS, thread_name_prefix="filter",
+                                              initializer=filter_test.set_fft_workers, initargs=(1,))
+        if _process_pool is None and FILTER_PROCESSES > 0:
+            # spawn, not fork: the server process holds TensorFlow and other threads
+            _process_pool = ProcessPoolExecutor(max_workers=FILTER_PROCESSES,
+                                                mp_context=multiprocessing.get_context("spawn"))
+    return _thread_pool, _process_pool
+
+def pool_for(name):
+    """
+    The pool a filter runs on, or None when it runs serially on the caller's
+    thread. Only releases_gil=False filters go to the process pool.
+    """
+    thread_pool, process_pool = _get_pools()
+    if not FILTERS[name].releases_gil and process_pool is not None:
+        return process_pool
+    return thread_pool
+
+def configure_pools(threads, processes):
+    """
+    Replaces the worker pools with new sizes (used by benchmarks and tooling).
+    """
+    global FILTER_THREADS, FILTER_PROCESSES, _thread_pool, _process_pool
+    with _pool_lock:
+        for pool in (_thread_pool, _process_pool):
+            if pool is not None:
+                pool.shutdown(wait=True)
+        FILTER_THREADS, FILTER_PROCESSES = threads, processes
+        _thread_pool = _process_pool = None
+
+def iter_filters_parallel(img, names=None, metrics=METRIC_NAMES, stages=None):
+    """
+    Yields (name, processed, metrics, error) for each filter as it completes.
+    error is None on success; otherwise processed and metrics are None.
+    Shared intermediates are computed once through stages (a new StageCache
+    if none is given); process-pool filters get a snapshot of it.
+    """
+    names = list(FILTERS) if names is None else list(names)
+    stages = StageCache() if stages is None else stages
+    reference = ReferenceMetrics(img, metrics)
+    futures = {}
+    serial = []
+    for name in filters_by_cost(names, reverse=True):
+        pool = pool_for(name)
+        if pool is None:
+            serial.append(name)
+        else:
+            futures[pool.submit(run_filter, name, img, metrics, stages, reference)] = name
+
+    # Serial filters run here while any pooled ones proceed, cheapest first
+    # so streamed results start arriving early
+    for name in reversed(serial):
+        try:
+            processed, computed = run_filter(name, img, metrics, stages, reference)
+            yield name, processed, computed, None
+        except Exception as e:
+            yield name, None, None, e
+
+    for future in as_completed(futures):
+        name = futures[future]
+        try:
+            processed, computed = future.result()
+            yield name, processed, computed, None
+        except Exception as e:
+            yield name, None, None, e
@@ -0,0 +1,120 @@
+import os
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+# ==============================
+# BYTE-BOUNDED LRU
+# ==============================
+
+DEFAULT_BUDGET_MB = 128
+
+
+class ByteLRUCache:
+    """
+    Thread-safe LRU mapping bounded by the total size of its values in bytes.
+    """
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self._entries = OrderedDict()  # key -> value, LRU order
+        self._sizes = {}
+        self._used = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return self._entries[key]
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, key, value, nbytes):
+        with self._lock:
+            if key in self._entries:
+                self._used -= self._sizes.pop(key)
+                del self._entries[key]
+            if nbytes > self.budget_bytes:
+                return
+            self._entries[key] = value
+            self._sizes[key] = nbytes
+            self._used += nbytes
+            while self._used > self.budget_bytes:
+                old_key, _ = self._entries.popitem(last=False)
+                self._used -= self._sizes.pop(old_key)
+                self._counters["evictions"] += 1
+
+    def items(self):
+        """
+        Snapshot of the (key, value) pairs, least recently used first.
+        """
+        with self._lock:
+            return list(self._entries.items())
+
+    def discard(self, key):
+        with self._lock:
+            if key in self._entries:
+                del self._entries[key]
+                self._used -= self._sizes.pop(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "used_bytes": self._used,
+                "budget_bytes": self.budget_bytes,
+            }
+
+
+# ==============================
+# DECODED IMAGE CACHE
+# ==============================
+# Raw upload bytes and decoded grayscale arrays keyed by image_id. Cached
+# arrays are marked read-only because the same array is handed to every
+# request for that image.
+
+class ImageCache(ByteLRUCache):
+    def put_raw(self, image_id, data):
+        self.put(("raw", image_id), data, len(data))
+
+    def get_raw(self, image_id, path):
+        """
+        Raw file bytes for image_id, read from path on a miss. None if the file is missing.
+        """
+        data = self.get(("raw", image_id))
+        if data is None:
+            if not os.path.exists(path):
+                return None
+            with open(path, "rb") as f:
+                data = f.read()
+            self.put_raw(image_id, data)
+        return data
+
+    def get_gray(self, image_id, path):
+        """
+        Decoded grayscale uint8 array for image_id (read-only). None if it cannot be decoded.
+        """
+        img = self.get(("gray", image_id))
+        if img is None:
+            data = self.get_raw(image_id, path)
+            if data is None:
+                return None
+            img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)
+            if img is None:
+                return None
+            img.flags.writeable = False
+            self.put(("gray", image_id), img, img.nbytes)
+        return img
+
+    def invalidate(self, image_id):
+        self.discard(("raw", image_id))
+        self.discard(("gray", image_id))
+
+
+image_cache = ImageCache(
+    int(float(os.environ.get("IMAGE_CACHE_MB", DEFAULT_BUDGET_MB)) * 1024 * 1024)
+)
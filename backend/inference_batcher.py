@@ -0,0 +1,107 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+import numpy as np
+
+# ==============================
+# DYNAMIC MICRO-BATCHING
+# ==============================
+# Requests that arrive within a short window are stacked into one batch and
+# run through a single forward pass. Each caller blocks on its own Future and
+# receives only its slice of the batched output.
+
+MAX_BATCH_SIZE = int(os.environ.get("INFERENCE_MAX_BATCH", 8))
+BATCH_WINDOW_MS = float(os.environ.get("INFERENCE_BATCH_WINDOW_MS", 10))
+
+# name -> MicroBatcher, used by /api/stats
+batchers = {}
+
+
+class MicroBatcher:
+    def __init__(self, name, predict_fn, max_batch_size=MAX_BATCH_SIZE, window_ms=BATCH_WINDOW_MS):
+        """
+        predict_fn takes an (N, ...) array and returns N outputs in the same order.
+        """
+        self.name = name
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.window_s = max(0.0, window_ms) / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "batches": 0, "max_batch_seen": 0}
+        batchers[name] = self
+
+    def _ensure_started(self):
+        # Started lazily so the worker thread is created in the serving
+        # process, not in a parent that forks before handling requests.
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name=f"batcher-{self.name}", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, sample):
+        """
+        Queue a single sample (without the batch axis) and return a Future.
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((sample, future))
+        return future
+
+    def predict(self, sample):
+        return self.submit(sample).result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    # Window closed: still take anything already waiting.
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            batch = [(s, f) for s, f in batch if f.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            with self._lock:
+                self._counters["requests"] += len(batch)
+                self._counters["batches"] += 1
+                self._counters["max_batch_seen"] = max(self._counters["max_batch_seen"], len(batch))
+
+            try:
+                outputs = self.predict_fn(np.stack([s for s, _ in batch]))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), out in zip(batch, outputs):
+                future.set_result(out)
+
+    def stats(self):
+        with self._lock:
+            batches = self._counters["batches"]
+            return {
+                **self._counters,
+                "mean_batch_size": (self._counters["requests"] / batches) if batches else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "window_ms": self.window_s * 1000.0,
+                "queued": self._queue.qsize(),
+            }
@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from image_cache import ByteLRUCache
+
+# ==============================
+# IN-PROCESS JOB QUEUE
+# ==============================
+# Long-running work is submitted as a job and executed on a bounded worker
+# pool, so the request thread returns immediately and clients poll for the
+# result. Jobs live in process memory (no external broker); finished jobs
+# are kept for JOB_RETENTION_S seconds, and at most JOB_RESULTS_MB of them
+# (result payloads plus a fixed overhead per job), least recently polled
+# evicted first.
+#
+# Cancellation is cooperative: a queued job is dropped before it starts, a
+# running job finishes its current call but its result is discarded (it
+# reports cancel_requested until then).
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_LIMIT = 32
+DEFAULT_RETENTION_S = 3600
+DEFAULT_RESULTS_MB = 64
+JOB_OVERHEAD_BYTES = 1024  # per finished job, bounds the count of small results
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind, fn):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.fn = fn
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.cancel_requested = False
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "error": self.error,
+            "cancel_requested": self.cancel_requested,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def _result_nbytes(result):
+    """
+    Approximate memory held by a job result: its nbytes attribute if it has
+    one, else the size of its JSON encoding.
+    """
+    if result is None:
+        return 0
+    nbytes = getattr(result, "nbytes", None)
+    if nbytes is not None:
+        return nbytes
+    return len(json.dumps(result, default=str))
+
+
+class JobQueue:
+    def __init__(self, workers, queue_limit, retention_s, results_budget_bytes):
+        self.queue_limit = queue_limit
+        self.retention_s = retention_s
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._workers = workers
+        self._jobs = {}  # queued and running jobs
+        self._finished = ByteLRUCache(results_budget_bytes)
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn):
+        """
+        Queue fn() as a job and return it. Raises QueueFull when too many jobs are waiting.
+        """
+        with self._lock:
+            self._prune()
+            pending = len(self._jobs)
+            if pending >= self.queue_limit:
+                raise QueueFull(f"Job queue is full ({pending} pending)")
+            job = Job(kind, fn)
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._prune()
+            return self._lookup(job_id)
+
+    def _lookup(self, job_id):
+        job = self._jobs.get(job_id)
+        return job if job is not None else self._finished.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        Returns the job after requesting cancellation, or None if it is unknown.
+        """
+        with self._lock:
+            self._prune()
+            job = self._lookup(job_id)
+            if job is None or job.status in FINISHED_STATES:
+                return job
+            job.cancel_requested = True
+            if job.status == QUEUED:
+                self._finish(job, CANCELLED)
+            return job
+
+    def _run(self, job):
+        with self._lock:
+            if job.cancel_requested:
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+        try:
+            result = job.fn()
+        except Exception as e:
+            with self._lock:
+                job.error = str(e)
+                self._finish(job, CANCELLED if job.cancel_requested else FAILED)
+            return
+        with self._lock:
+            if job.cancel_requested:
+                self._finish(job, CANCELLED)
+            else:
+                job.result = result
+                self._finish(job, SUCCEEDED)
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished_at = time.time()
+        job.fn = None
+        nbytes = JOB_OVERHEAD_BYTES + _result_nbytes(job.result)
+        if nbytes > self._finished.budget_bytes:
+            job.result = None
+            job.status = FAILED
+            job.error = "Result exceeds the job result budget"
+            nbytes = JOB_OVERHEAD_BYTES
+        del self._jobs[job.id]
+        self._finished.put(job.id, job, nbytes)
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_s
+        for job_id, job in self._finished.items():
+            if job.finished_at < cutoff:
+                self._finished.discard(job_id)
+
+    def stats(self):
+        with self._lock:
+            self._prune()
+            counts = {}
+            for job in list(self._jobs.values()) + [job for _, job in self._finished.items()]:
+                counts[job.status] = counts.get(job.status, 0) + 1
+            finished = self._finished.stats()
+            return {
+                "workers": self._workers,
+                "queue_limit": self.queue_limit,
+                "jobs": counts,
+                "results_bytes": finished["used_bytes"],
+                "results_budget_bytes": finished["budget_bytes"],
+                "evicted": finished["evictions"],
+            }
+
+
+job_queue = JobQueue(
+    int(os.environ.get("JOB_WORKERS", DEFAULT_WORKERS)),
+    int(os.environ.get("JOB_QUEUE_LIMIT", DEFAULT_QUEUE_LIMIT)),
+    float(os.environ.get("JOB_RETENTION_S", DEFAULT_RETENTION_S)),
+    int(float(os.environ.get("JOB_RESULTS_MB", DEFAULT_RESULTS_MB)) * 1024 * 1024),
+)
@@ -1,4 +1,19 @@
+"""
+Pseudo-mask generation for segmentation training.
+
+Usage:
+    python mask_generation.py
+    python mask_generation.py --images path/to/images --masks path/to/masks --workers 8
+    python mask_generation.py --param min_area=50 --force
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
 import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import cv2
 import numpy as np
 
@@ -11,88 +26,358 @@ BASE_PATH = os.path.join(PROJECT_ROOT, "dataset")
 IMAGE_DIR = os.path.join(PROJECT_ROOT, "images")
 MASK_DIR = os.path.join(BASE_PATH, "masks")
 
-os.makedirs(MASK_DIR, exist_ok=True)
-
-print("PROJECT ROOT:", PROJECT_ROOT)
-print("IMAGE DIR:", IMAGE_DIR)
-print("MASK DIR:", MASK_DIR)
-
-if not os.path.isdir(IMAGE_DIR):
-    raise FileNotFoundError(f"Image folder not found: {IMAGE_DIR}")
-
-# Debug: List contents of IMAGE_DIR
-print("Contents of IMAGE_DIR:", os.listdir(IMAGE_DIR))
+# ==============================
+# MASK PARAMETERS
+# ==============================
+# Changing any of these (or MASK_VERSION, when the algorithm itself
+# changes) regenerates every mask on the next run.
+MASK_VERSION = 1
+MASK_PARAMS = {
+    "size": 256,          # masks are size x size
+    "clip_limit": 2.0,    # CLAHE
+    "tile_grid": 8,
+    "block_size": 11,     # adaptive threshold
+    "c": 2,
+    "open_kernel": 3,     # morphological opening
+    "min_area": 30,       # relaxed threshold (IMPORTANT)
+}
 
+MANIFEST_NAME = "manifest.jsonl"
+UNREADABLE = "unreadable image"
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp")
 
-print("\nStarting pseudo-mask generation...\n")
+def params_key(params):
+    """
+    Short hash of the mask parameters and MASK_VERSION, stored per mask.
+    """
+    payload = json.dumps({"version": MASK_VERSION, **params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
 
 # ==============================
-# PROCESS EACH IMAGE
+# PSEUDO-MASKS IN MEMORY
 # ==============================
-for img_name in os.listdir(IMAGE_DIR):
+# pseudo_mask is the whole chain (resize, CLAHE, adaptive threshold,
+# opening, small-component removal) on one grayscale array;
+# pseudo_masks and iter_mask_batches run it over many images on a thread
+# pool (OpenCV releases the GIL), so training code can build masks on the
+# fly without writing them to disk.
 
-    img_path = os.path.join(IMAGE_DIR, img_name)
+MASK_THREADS = int(os.environ.get("MASK_THREADS", os.cpu_count() or 1))
+DEFAULT_MASK_BATCH = 32
 
-    # Skip folders
-    if os.path.isdir(img_path):
-        continue
+_mask_pool = None
+_mask_pool_lock = threading.Lock()
 
-    # ------------------------------
-    # 1. READ IMAGE
-    # ------------------------------
-    img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
-    if img is None:
-        continue
+def _get_mask_pool():
+    global _mask_pool
+    with _mask_pool_lock:
+        if _mask_pool is None and MASK_THREADS > 1:
+            _mask_pool = ThreadPoolExecutor(max_workers=MASK_THREADS, thread_name_prefix="mask")
+    return _mask_pool
+
+def remove_small_components(mask, min_area):
+    """
+    Keeps the 8-connected components of a binary mask larger than min_area
+    pixels. The keep/drop decision per label is a lookup table applied to
+    the label image in one pass.
+    """
+    num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    lut = np.where(stats[:, cv2.CC_STAT_AREA] > min_area, 255, 0).astype(np.uint8)
+    lut[0] = 0  # background
+    return np.take(lut, labels)
+
+def pseudo_mask(img, params=None):
+    """
+    Pseudo-mask (uint8, 0/255, size x size) of a grayscale image.
+    params overrides entries of MASK_PARAMS.
+    """
+    params = MASK_PARAMS if params is None else {**MASK_PARAMS, **params}
 
-    img = cv2.resize(img, (256, 256))
+    # 1. RESIZE
+    img = cv2.resize(img, (params["size"], params["size"]))
 
-    # ------------------------------
     # 2. CONTRAST ENHANCEMENT (CLAHE)
-    # ------------------------------
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    grid = params["tile_grid"]
+    clahe = cv2.createCLAHE(clipLimit=params["clip_limit"], tileGridSize=(grid, grid))
     enhanced = clahe.apply(img)
 
-    # ------------------------------
     # 3. ADAPTIVE THRESHOLDING
-    # ------------------------------
     mask = cv2.adaptiveThreshold(
         enhanced,
         255,
         cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
         cv2.THRESH_BINARY_INV,
-        11,
-        2
+        params["block_size"],
+        params["c"]
     )
 
-    # ------------------------------
     # 4. LIGHT MORPHOLOGICAL OPENING
-    # ------------------------------
-    kernel = np.ones((3, 3), np.uint8)
+    kernel = np.ones((params["open_kernel"], params["open_kernel"]), np.uint8)
     mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=1)
 
-    # ------------------------------
     # 5. REMOVE ONLY VERY SMALL NOISE
-    # ------------------------------
-    num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    # 6. FINAL MASK (NO EROSION)
+    return remove_small_components(mask, params["min_area"])
 
-    clean_mask = np.zeros_like(mask)
-    min_area = 30  # relaxed threshold (IMPORTANT)
+def _map_masks(fn, items):
+    pool = _get_mask_pool()
+    if pool is None or len(items) <= 1:
+        return [fn(item) for item in items]
+    return list(pool.map(fn, items))
 
-    for i in range(1, num_labels):  # skip background
-        if stats[i, cv2.CC_STAT_AREA] > min_area:
-            clean_mask[labels == i] = 255
+def pseudo_masks(images, params=None):
+    """
+    Masks of a sequence (or (N, H, W) stack) of grayscale images as one
+    (N, size, size) stack.
+    """
+    params = MASK_PARAMS if params is None else {**MASK_PARAMS, **params}
+    size = params["size"]
+    masks = _map_masks(lambda img: pseudo_mask(img, params), list(images))
+    return np.stack(masks) if masks else np.empty((0, size, size), np.uint8)
 
-    # ------------------------------
-    # 6. FINAL MASK (NO EROSION)
-    # ------------------------------
-    final_mask = clean_mask
+def iter_mask_batches(paths, batch_size=DEFAULT_MASK_BATCH, params=None):
+    """
+    Yields (paths, images, masks) for consecutive batches of image files:
+    images are the grayscale inputs resized to size x size, masks their
+    pseudo-masks, both (N, size, size) uint8. Unreadable files are left out
+    of the batch.
+    """
+    params = MASK_PARAMS if params is None else {**MASK_PARAMS, **params}
+    size = params["size"]
+
+    def load(path):
+        img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            return None
+        return cv2.resize(img, (size, size)), pseudo_mask(img, params)
+
+    paths = list(paths)
+    for start in range(0, len(paths), batch_size):
+        chunk = paths[start:start + batch_size]
+        loaded = [(p, r) for p, r in zip(chunk, _map_masks(load, chunk)) if r is not None]
+        if not loaded:
+            continue
+        yield ([p for p, _ in loaded],
+               np.stack([r[0] for _, r in loaded]),
+               np.stack([r[1] for _, r in loaded]))
+
+# ==============================
+# MASK FILES
+# ==============================
+def _generate_one(img_path, mask_path, params):
+    """
+    Reads one image and writes its mask. Returns None or an error message.
+    Runs in the worker processes.
+    """
+    img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        return UNREADABLE
+    mask = pseudo_mask(img, params)
+    # Write next to the target and rename, so an interrupted run never
+    # leaves a truncated mask behind (keeps the extension for imwrite)
+    root, ext = os.path.splitext(mask_path)
+    tmp_path = f"{root}.tmp{os.getpid()}{ext}"
+    if not cv2.imwrite(tmp_path, mask):
+        return "could not write mask"
+    os.replace(tmp_path, mask_path)
+    return None
+
+# ==============================
+# MANIFEST
+# ==============================
+# One JSON line per generated mask, appended as each mask is written:
+#   {"image": name, "mtime_ns": ..., "size": ..., "params": params_key}
+# Images that cannot be read get the same line plus "error", so they are
+# not read again until the file changes (or --force). Later lines win.
+# Because lines are appended as work completes, a run that is interrupted
+# keeps everything finished so far and the next run resumes with the rest.
+# The file is rewritten compactly after each full run.
+
+class MaskManifest:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._file = None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # partial last line of an interrupted run
+                    self.entries[entry["image"]] = entry
+        except FileNotFoundError:
+            pass
+
+    def is_current(self, name, source_stat, mask_path, key):
+        """
+        True if the mask of name was generated from this version of the
+        source with these parameters and is still on disk, newer than the
+        source, or if this version of the source was found unreadable.
+        """
+        entry = self.entries.get(name)
+        if entry is None or entry["params"] != key:
+            return False
+        if entry["mtime_ns"] != source_stat.st_mtime_ns or entry["size"] != source_stat.st_size:
+            return False
+        if "error" in entry:
+            return True
+        try:
+            return os.stat(mask_path).st_mtime_ns >= source_stat.st_mtime_ns
+        except FileNotFoundError:
+            return False
+
+    def error(self, name):
+        """
+        Recorded error of name, or None.
+        """
+        return self.entries.get(name, {}).get("error")
+
+    def record(self, name, source_stat, key, error=None):
+        entry = {"image": name, "mtime_ns": source_stat.st_mtime_ns,
+                 "size": source_stat.st_size, "params": key}
+        if error is not None:
+            entry["error"] = error
+        self.entries[name] = entry
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def compact(self, names=None):
+        """
+        Rewrites the manifest with one line per entry (only names, if given).
+        """
+        self.close()
+        keep = self.entries if names is None else {n: self.entries[n] for n in names if n in self.entries}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in keep.values():
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, self.path)
+        self.entries = dict(keep)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+# ==============================
+# PIPELINE
+# ==============================
+def list_images(image_dir):
+    """
+    [(name, stat)] of the image files directly in image_dir, sorted by name.
+    """
+    images = []
+    with os.scandir(image_dir) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                images.append((entry.name, entry.stat()))
+    return sorted(images)
+
+def generate_masks(image_dir=IMAGE_DIR, mask_dir=MASK_DIR, params=None, workers=None,
+                   force=False, progress=None):
+    """
+    Generates the masks of image_dir that are missing or out of date in
+    mask_dir, on a process pool of workers (all cores by default; 1 runs
+    serially). force regenerates everything. progress(done, total) is
+    called as masks finish. Returns counts (total, skipped, generated,
+    failed in this run) and errors: {name: message} for every image without
+    a mask, including unreadable images skipped from earlier runs.
+    """
+    params = {**MASK_PARAMS, **(params or {})}
+    key = params_key(params)
+    if not os.path.isdir(image_dir):
+        raise FileNotFoundError(f"Image folder not found: {image_dir}")
+    os.makedirs(mask_dir, exist_ok=True)
+
+    images = list_images(image_dir)
+    manifest = MaskManifest(os.path.join(mask_dir, MANIFEST_NAME))
+    todo = [(name, st) for name, st in images
+            if force or not manifest.is_current(name, st, os.path.join(mask_dir, name), key)]
+    counts = {"total": len(images), "skipped": len(images) - len(todo), "generated": 0, "failed": 0}
+    pending = {name for name, _ in todo}
+    errors = {name: manifest.error(name) for name, _ in images
+              if name not in pending and manifest.error(name) is not None}
+
+    def finished(name, st, error):
+        if error is None:
+            manifest.record(name, st, key)
+            counts["generated"] += 1
+        else:
+            # Only a bad source is final; write errors are retried next run
+            if error == UNREADABLE:
+                manifest.record(name, st, key, error)
+            errors[name] = error
+            counts["failed"] += 1
+        if progress:
+            progress(counts["generated"] + counts["failed"], len(todo))
+
+    workers = workers or os.cpu_count() or 1
+    tasks = [(os.path.join(image_dir, name), os.path.join(mask_dir, name)) for name, _ in todo]
+    try:
+        if workers <= 1 or len(todo) <= 1:
+            for (name, st), (src, dst) in zip(todo, tasks):
+                try:
+                    finished(name, st, _generate_one(src, dst, params))
+                except Exception as e:
+                    finished(name, st, str(e))
+        else:
+            # spawn, not fork, like the filter pools
+            with ProcessPoolExecutor(max_workers=workers,
+                                     mp_context=multiprocessing.get_context("spawn")) as pool:
+                futures = {pool.submit(_generate_one, src, dst, params): item
+                           for item, (src, dst) in zip(todo, tasks)}
+                for future in as_completed(futures):
+                    name, st = futures[future]
+                    try:
+                        finished(name, st, future.result())
+                    except Exception as e:
+                        finished(name, st, str(e))
+    finally:
+        manifest.close()
+
+    # Drop entries of deleted images once a run has completed
+    manifest.compact([name for name, _ in images])
+    return {**counts, "errors": dict(sorted(errors.items()))}
+
+# ==============================
+# MAIN
+# ==============================
+def main():
+    parser = argparse.ArgumentParser(description="Generate pseudo-masks for segmentation training")
+    parser.add_argument("--images", default=IMAGE_DIR)
+    parser.add_argument("--masks", default=MASK_DIR)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--param", action="append", default=[],
+                        help=f"name=value, overrides a mask parameter ({', '.join(MASK_PARAMS)})")
+    parser.add_argument("--force", action="store_true", help="Regenerate every mask")
+    args = parser.parse_args()
+
+    params = {}
+    for item in args.param:
+        name, _, raw = item.partition("=")
+        if name not in MASK_PARAMS:
+            parser.error(f"Unknown mask parameter {name} (available: {', '.join(MASK_PARAMS)})")
+        params[name] = type(MASK_PARAMS[name])(raw)
+
+    print("PROJECT ROOT:", PROJECT_ROOT)
+    print("IMAGE DIR:", args.images)
+    print("MASK DIR:", args.masks)
+    print("\nStarting pseudo-mask generation...\n")
 
-    # ------------------------------
-    # 7. SAVE MAS
-    # ------------------------------
-    save_path = os.path.join(MASK_DIR, img_name)
-    cv2.imwrite(save_path, final_mask)
+    start = time.perf_counter()
+    def progress(done, total):
+        print(f"\r{done}/{total} masks, {time.perf_counter() - start:.0f}s", end="", flush=True)
+    counts = generate_masks(args.images, args.masks, params, args.workers, args.force, progress)
+    print()
+    for name, error in counts["errors"].items():
+        print(f"Failed {name}: {error}")
 
-    print(f"Saved mask: {save_path}")
+    print(f"\n✅ Pseudo-mask generation completed: {counts['generated']} generated, "
+          f"{counts['skipped']} up to date, {counts['failed']} failed "
+          f"({time.perf_counter() - start:.1f}s)")
 
-print("\n✅ Pseudo-mask generation completed successfully.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
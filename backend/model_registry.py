@@ -0,0 +1,135 @@
+import os
+import gc
+import threading
+import time
+from collections import OrderedDict
+
+# ==============================
+# MODEL REGISTRY
+# ==============================
+# Keeps Keras models resident across requests instead of reloading the .h5
+# file on every call. Models are loaded lazily on first use and evicted
+# least-recently-used first once the configured memory budget is exceeded.
+#
+# Each model has its own load lock: a cold load blocks only requests for
+# that model, while hits on resident models go through the registry lock
+# alone. A failed load (e.g. missing .h5 file) is remembered for
+# retry_s seconds so it is not retried from disk on every request.
+
+DEFAULT_BUDGET_MB = 512
+DEFAULT_RETRY_S = 60.0
+
+
+def _estimate_nbytes(model):
+    """
+    Approximate resident size of a model from its parameter count (float32).
+    """
+    try:
+        return int(model.count_params()) * 4
+    except Exception:
+        return 0
+
+
+class ModelRegistry:
+    def __init__(self, budget_bytes, retry_s=DEFAULT_RETRY_S):
+        self.budget_bytes = budget_bytes
+        self.retry_s = retry_s
+        self._loaders = {}
+        self._models = OrderedDict()  # name -> (model, nbytes), LRU order
+        self._load_locks = {}  # name -> Lock held while that model loads
+        self._failed_at = {}  # name -> monotonic time of the last failed load
+        self._lock = threading.RLock()
+        self._counters = {"hits": 0, "loads": 0, "load_failures": 0, "evictions": 0}
+
+    def register(self, name, loader):
+        """
+        Register a zero-argument loader that returns a model (or None on failure).
+        """
+        with self._lock:
+            self._loaders[name] = loader
+            self._failed_at.pop(name, None)
+
+    def get(self, name):
+        with self._lock:
+            found, model = self._lookup(name)
+            if found:
+                return model
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # Concurrent requests for a cold model queue on its load lock and
+        # find it resident (or failed) once the first load finishes.
+        with load_lock:
+            with self._lock:
+                found, model = self._lookup(name)
+                if found:
+                    return model
+                loader = self._loaders[name]
+
+            model = loader()
+
+            with self._lock:
+                if model is None:
+                    self._counters["load_failures"] += 1
+                    self._failed_at[name] = time.monotonic()
+                    return None
+
+                self._failed_at.pop(name, None)
+                nbytes = _estimate_nbytes(model)
+                self._counters["loads"] += 1
+                self._models[name] = (model, nbytes)
+                self._evict_over_budget(keep=name)
+                return model
+
+    def _lookup(self, name):
+        """
+        (True, model) for a resident model, (True, None) for a recent load
+        failure, (False, None) when a load is needed. Call with the lock held.
+        """
+        if name in self._models:
+            self._models.move_to_end(name)
+            self._counters["hits"] += 1
+            return True, self._models[name][0]
+
+        if name not in self._loaders:
+            raise KeyError(f"Unknown model: {name}")
+
+        failed_at = self._failed_at.get(name)
+        if failed_at is not None and time.monotonic() - failed_at < self.retry_s:
+            return True, None
+        return False, None
+
+    def evict(self, name):
+        with self._lock:
+            if self._models.pop(name, None) is not None:
+                self._counters["evictions"] += 1
+                print(f"Evicted model '{name}' from registry.")
+                gc.collect()
+
+    def _used_bytes(self):
+        return sum(nbytes for _, nbytes in self._models.values())
+
+    def _evict_over_budget(self, keep):
+        while self._used_bytes() > self.budget_bytes:
+            victim = next((n for n in self._models if n != keep), None)
+            if victim is None:
+                # The model just loaded is larger than the whole budget on its
+                # own; keep it rather than thrash.
+                print(f"Warning: model '{keep}' exceeds the registry budget of "
+                      f"{self.budget_bytes // (1024 * 1024)} MB.")
+                break
+            self.evict(victim)
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._counters,
+                "budget_bytes": self.budget_bytes,
+                "used_bytes": self._used_bytes(),
+                "resident": {name: nbytes for name, (_, nbytes) in self._models.items()},
+            }
+
+
+registry = ModelRegistry(
+    int(float(os.environ.get("MODEL_MEMORY_BUDGET_MB", DEFAULT_BUDGET_MB)) * 1024 * 1024),
+    float(os.environ.get("MODEL_LOAD_RETRY_S", DEFAULT_RETRY_S)),
+)
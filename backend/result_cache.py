@@ -0,0 +1,40 @@
+import os
+import glob
+import hashlib
+from image_cache import ByteLRUCache
+
+# ==============================
+# CONTENT-ADDRESSED RESULTS
+# ==============================
+# Uploads are named after a hash of their bytes, so a re-upload of the same
+# fundus photo maps to the same id and every result computed for it
+# (filters, masks, classifications) can be reused.
+
+DEFAULT_BUDGET_MB = 256
+HASH_LENGTH = 32
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def content_key(image_id):
+    """
+    Results are keyed by the hash alone so the file extension does not matter.
+    """
+    return os.path.splitext(image_id)[0]
+
+
+def find_existing_upload(upload_folder, digest):
+    """
+    Returns the stored filename for digest (whatever its extension), or None.
+    """
+    matches = glob.glob(os.path.join(upload_folder, f"{digest}.*"))
+    if not matches and os.path.exists(os.path.join(upload_folder, digest)):
+        return digest
+    return os.path.basename(matches[0]) if matches else None
+
+
+result_cache = ByteLRUCache(
+    int(float(os.environ.get("RESULT_CACHE_MB", DEFAULT_BUDGET_MB)) * 1024 * 1024)
+)
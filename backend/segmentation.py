@@ -2,13 +2,14 @@ import os
 import cv2
 import numpy as np
 import tensorflow as tf
-import gc
 from tensorflow.keras.layers import (
     Conv2D, MaxPooling2D, UpSampling2D,
     Input, BatchNormalization, Activation,
     concatenate, Multiply
 )
 from tensorflow.keras.models import Model, load_model
+from model_registry import registry
+from inference_batcher import MicroBatcher
 
 # ==============================
 # MODEL DEFINITION (Must match training)
@@ -82,13 +83,9 @@ def combined_loss(y_true, y_pred):
 # ==============================
 # LAZY LOAD MODEL
 # ==============================
-model = None
-
-def get_model():
-    global model
-    if model is not None:
-        return model
+MODEL_NAME = "attention_unet"
 
+def _load_model():
     curr_dir = os.path.dirname(os.path.abspath(__file__))
     model_path = os.path.join(curr_dir, "models", "attention_unet.h5")
     
@@ -117,45 +114,72 @@ def get_model():
             
     return model
 
+registry.register(MODEL_NAME, _load_model)
+
+def get_model():
+    # Model stays resident in the registry between requests
+    return registry.get(MODEL_NAME)
+
+def _predict_batch(batch):
+    model = get_model()
+    if model is None:
+        raise RuntimeError("Segmentation model not loaded")
+    return model.predict(batch, verbose=0)
+
+# Concurrent requests share one forward pass
+batcher = MicroBatcher(MODEL_NAME, _predict_batch)
+
 # ==============================
 # INFERENCE FUNCTION
 # ==============================
-def segment_image(image_path):
-    global model
-    model = get_model()
-    if model is None:
+def preprocess(img):
+    img_resized = cv2.resize(img, (256, 256))
+    img_norm = img_resized.astype(np.float32) / 255.0
+    return np.expand_dims(img_norm, axis=-1) # (256, 256, 1)
+
+def predict_mask(img_input, original_shape):
+    """
+    Returns a uint8 mask at original_shape (H, W), or None if the model is unavailable.
+    """
+    if get_model() is None:
         print("Model not loaded, cannot segment.")
         return None
 
-    img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-    if img is None:
-        return None
-    
-    original_shape = img.shape[:2] # (H, W)
-    
-    # Preprocess
-    img_resized = cv2.resize(img, (256, 256))
-    img_norm = img_resized / 255.0
-    img_input = np.expand_dims(img_norm, axis=(0, -1)) # (1, 256, 256, 1)
-    
-    # Predict
-    pred = model.predict(img_input)[0] # (256, 256, 1)
+    # Predict (batched with any other requests in flight)
+    pred = batcher.predict(img_input) # (256, 256, 1)
     
     # Post-process
     mask = (pred > 0.5).astype(np.uint8) * 255
-    mask_resized = cv2.resize(mask, (original_shape[1], original_shape[0]), interpolation=cv2.INTER_NEAREST)
-    
-    # Save mask
+    return cv2.resize(mask, (original_shape[1], original_shape[0]), interpolation=cv2.INTER_NEAREST)
+
+def save_mask(image_path, mask):
+    """
+    Writes the mask next to its image as mask_<name>. Returns (mask_path, encoded bytes).
+    """
     dir_name = os.path.dirname(image_path)
     base_name = os.path.basename(image_path)
     mask_filename = f"mask_{base_name}"
     mask_path = os.path.join(dir_name, mask_filename)
     
-    cv2.imwrite(mask_path, mask_resized)
+    # Encode once so callers can reuse the bytes without reading the file back
+    ext = os.path.splitext(base_name)[1] or ".png"
+    ok, buffer = cv2.imencode(ext, mask)
+    if not ok:
+        raise ValueError(f"Could not encode mask as {ext}")
+    data = buffer.tobytes()
+    with open(mask_path, "wb") as f:
+        f.write(data)
     
-    # Critical: Free memory
-    model = None
-    tf.keras.backend.clear_session()
-    gc.collect()
+    return mask_path, data
+
+def segment_image(image_path):
+    img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        return None
+    
+    mask_resized = predict_mask(preprocess(img), img.shape[:2])
+    if mask_resized is None:
+        return None
     
+    mask_path, _ = save_mask(image_path, mask_resized)
     return mask_path
@@ -0,0 +1,70 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+# The backend modules are imported by name, as the app and scripts do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def synthetic_fundus(size, seed=0):
+    """
+    Seeded fundus-like test image: bright disc, dark vessel lines and noise.
+    """
+    import cv2
+    rng = np.random.default_rng(seed)
+    y, x = np.ogrid[:size, :size]
+    dist_sq = (x - size / 2) ** 2 + (y - size / 2) ** 2
+    img = 200 * np.exp(-dist_sq / (2 * (size / 3) ** 2)) + rng.normal(0, 8, (size, size))
+    for _ in range(12):
+        p1 = tuple(int(v) for v in rng.integers(0, size, 2))
+        p2 = tuple(int(v) for v in rng.integers(0, size, 2))
+        cv2.line(img, p1, p2, float(rng.uniform(20, 60)), max(1, size // 128))
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+@pytest.fixture(scope="session")
+def fundus():
+    return synthetic_fundus(512)
+
+
+def png_bytes(img):
+    import cv2
+    ok, buf = cv2.imencode(".png", img)
+    assert ok
+    return buf.tobytes()
+
+
+def upload(client, data, filename="fundus.png"):
+    """
+    POSTs data to /api/upload and returns the JSON response.
+    """
+    import io
+    response = client.post("/api/upload", data={"image": (io.BytesIO(data), filename)},
+                           content_type="multipart/form-data")
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+@pytest.fixture(scope="session")
+def backend_app(tmp_path_factory):
+    # app creates ./uploads on import and loads TensorFlow: import it once,
+    # from a scratch directory
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("app"))
+    try:
+        import app
+    finally:
+        os.chdir(cwd)
+    return app
+
+
+@pytest.fixture
+def client(backend_app, tmp_path, monkeypatch):
+    monkeypatch.setattr(backend_app, "UPLOAD_FOLDER", str(tmp_path))
+    return backend_app.app.test_client()
+
+
+@pytest.fixture
+def image_id(client):
+    return upload(client, png_bytes(synthetic_fundus(128, seed=5)))["id"]
@@ -0,0 +1,35 @@
+import numpy as np
+import filter_test
+from filter_stages import StageCache
+
+
+def test_fused_ace_me_matches_reference(fundus):
+    stages = StageCache()
+    reference = filter_test.filter_ace_me_reference(fundus, stages)
+    fused = filter_test.filter_ace_me_novel(fundus, stages)
+    diff = np.abs(reference.astype(np.int16) - fused.astype(np.int16))
+    assert diff.max() <= 1
+
+
+def test_fused_ace_me_reuses_buffers_across_shapes(fundus):
+    # Buffers are per thread and resized on a shape change
+    small = fundus[:200, :300]
+    for img in (fundus, small, fundus):
+        reference = filter_test.filter_ace_me_reference(img)
+        fused = filter_test.filter_ace_me_novel(img)
+        assert fused.shape == img.shape
+        assert np.abs(reference.astype(np.int16) - fused.astype(np.int16)).max() <= 1
+
+
+def test_large_images_do_not_keep_buffers(fundus, monkeypatch):
+    monkeypatch.setattr(filter_test, "ACE_ME_CACHE_PIXELS", 256 * 256)
+    small = fundus[:256, :256]
+    filter_test.filter_ace_me_novel(small)
+    cached = filter_test._ace_me_local.buffers
+    assert cached["shape"] == small.shape
+    assert filter_test._ace_me_buffers(small.shape) is cached
+
+    reference = filter_test.filter_ace_me_reference(fundus)
+    fused = filter_test.filter_ace_me_novel(fundus)
+    assert np.abs(reference.astype(np.int16) - fused.astype(np.int16)).max() <= 1
+    assert filter_test._ace_me_local.buffers is None
@@ -0,0 +1,102 @@
+import threading
+import time
+import pytest
+
+
+def wait_for(client, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        body = client.get(f"/api/jobs/{job_id}").get_json()
+        if body["status"] not in ("queued", "running"):
+            return body
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def submit(client, **body):
+    return client.post("/api/jobs", json=body)
+
+
+def test_filters_job_matches_synchronous_endpoint(client, image_id):
+    response = submit(client, kind="filters", image_id=image_id, params={"filters": "Mean,CLAHE"})
+    assert response.status_code == 202
+    job = response.get_json()
+    assert response.headers["Location"] == job["status_url"] == f"/api/jobs/{job['id']}"
+    assert job["cancel_requested"] is False
+
+    assert wait_for(client, job["id"])["status"] == "succeeded"
+    result = client.get(job["result_url"])
+    assert result.status_code == 200
+    assert result.get_json() == client.get(f"/api/filters/{image_id}?filters=Mean,CLAHE").get_json()
+
+
+def test_urls_job_artifacts_are_fetchable(client, image_id):
+    job = submit(client, kind="filters", image_id=image_id,
+                 params={"filters": "Gaussian", "format": "urls"}).get_json()
+    wait_for(client, job["id"])
+    [item] = client.get(job["result_url"]).get_json()
+    artifact = client.get(item["image_url"])
+    assert artifact.status_code == 200
+    assert artifact.mimetype == "image/jpeg"
+
+
+def test_cancel_running_job(backend_app, client, image_id, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    def blocking_payload(*args):
+        started.set()
+        release.wait(10)
+        return []
+
+    monkeypatch.setattr(backend_app, "filters_payload", blocking_payload)
+    job = submit(client, kind="filters", image_id=image_id).get_json()
+    assert started.wait(10)
+
+    cancelled = client.delete(f"/api/jobs/{job['id']}").get_json()
+    assert cancelled["status"] == "running"
+    assert cancelled["cancel_requested"] is True
+    assert client.get(job["result_url"]).status_code == 202
+
+    release.set()
+    assert wait_for(client, job["id"])["status"] == "cancelled"
+    result = client.get(job["result_url"])
+    assert result.status_code == 409
+    assert result.get_json()["status"] == "cancelled"
+
+
+def test_failed_job_result_is_409(backend_app, client, image_id, monkeypatch):
+    def failing_payload(*args):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(backend_app, "classification_payload", failing_payload)
+    job = submit(client, kind="classify", image_id=image_id).get_json()
+    assert wait_for(client, job["id"])["error"] == "boom"
+    result = client.get(job["result_url"])
+    assert result.status_code == 409
+    assert result.get_json() == {"error": "boom", "status": "failed"}
+
+
+@pytest.mark.parametrize("method, path", [
+    ("get", "/api/jobs/nope"),
+    ("get", "/api/jobs/nope/result"),
+    ("delete", "/api/jobs/nope"),
+])
+def test_unknown_job_is_404(client, method, path):
+    response = getattr(client, method)(path)
+    assert response.status_code == 404
+    assert response.get_json() == {"error": "Job not found"}
+
+
+@pytest.mark.parametrize("body, status, message", [
+    ({"kind": "filters"}, 400, "image_id is required"),
+    ({"kind": "resize", "image_id": None}, 400, "Unknown job kind: resize"),
+    ({"kind": "filters", "image_id": None, "params": {"filters": "Nope"}}, 400, "Unknown filters: Nope"),
+    ({"kind": "segment", "image_id": None, "params": {"format": "png"}}, 400, "Unsupported format: png"),
+    ({"kind": "analyze", "image_id": "missing.png"}, 404, "Image not found"),
+])
+def test_invalid_job_is_rejected(client, image_id, body, status, message):
+    if "image_id" in body and body["image_id"] is None:
+        body = {**body, "image_id": image_id}
+    response = submit(client, **body)
+    assert response.status_code == status
+    assert response.get_json() == {"error": message}
@@ -0,0 +1,71 @@
+import json
+import pytest
+from conftest import png_bytes, synthetic_fundus, upload
+
+NAMES = ["Mean", "CLAHE", "Median"]
+QUERY = "filters=" + ",".join(NAMES)
+
+
+def ndjson_events(response):
+    body = response.get_data(as_text=True)
+    assert body.endswith("\n")
+    return [json.loads(line) for line in body.splitlines()]
+
+
+def sse_events(response):
+    body = response.get_data(as_text=True)
+    assert body.endswith("\n\n")
+    events = []
+    for block in body[:-2].split("\n\n"):
+        event, data = block.split("\n")
+        assert event.startswith("event: ") and data.startswith("data: ")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_ndjson_one_line_per_filter_then_done(client, image_id):
+    response = client.get(f"/api/filters/{image_id}?stream=ndjson&{QUERY}")
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    events = ndjson_events(response)
+    assert events[-1] == {"done": True}
+    assert sorted(e["name"] for e in events[:-1]) == sorted(NAMES)
+    for event in events[:-1]:
+        assert set(event) == {"name", "metrics", "image"}
+
+
+def test_sse_frames_and_headers(client, image_id):
+    response = client.get(f"/api/filters/{image_id}?stream=sse&format=urls&{QUERY}")
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    assert response.headers["Cache-Control"] == "no-cache"
+    events = sse_events(response)
+    assert [kind for kind, _ in events] == ["filter"] * len(NAMES) + ["done"]
+    assert sorted(data["name"] for _, data in events[:-1]) == sorted(NAMES)
+    assert all(data["image_url"].startswith("/api/artifacts/") for _, data in events[:-1])
+
+
+def test_cached_results_stream_in_request_order(client, image_id):
+    client.get(f"/api/filters/{image_id}?{QUERY}")
+    events = ndjson_events(client.get(f"/api/filters/{image_id}?stream=ndjson&{QUERY}"))
+    # Canonical registry order, as in the non-streaming response
+    assert [e["name"] for e in events[:-1]] == ["Mean", "Median", "CLAHE"]
+
+
+def test_failure_is_reported_in_band(backend_app, client, monkeypatch):
+    def failing_compute(*args, **kwargs):
+        yield "Mean", {"metrics": {}, "encoded": b""}
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(backend_app, "compute_filters", failing_compute)
+    # An image of its own: cached results would bypass compute_filters
+    image_id = upload(client, png_bytes(synthetic_fundus(64, seed=11)))["id"]
+    events = sse_events(client.get(f"/api/filters/{image_id}?stream=sse&filters=Gaussian"))
+    assert [kind for kind, _ in events] == ["filter", "error"]
+    assert events[-1][1] == {"error": "boom"}
+
+
+@pytest.mark.parametrize("stream", ["json", "SSE", ""])
+def test_unknown_stream_format_is_rejected(client, image_id, stream):
+    response = client.get(f"/api/filters/{image_id}?stream={stream}")
+    assert response.status_code == 400
@@ -0,0 +1,44 @@
+import os
+from conftest import png_bytes, synthetic_fundus, upload
+
+
+def test_reupload_returns_same_id(client, tmp_path):
+    data = png_bytes(synthetic_fundus(64, seed=1))
+    first = upload(client, data, "a.png")
+    second = upload(client, data, "renamed.jpg")
+    assert not first["duplicate"]
+    assert second["duplicate"]
+    assert second["id"] == first["id"]
+    assert os.listdir(tmp_path) == [first["id"]]
+
+
+def test_different_bytes_get_different_ids(client):
+    first = upload(client, png_bytes(synthetic_fundus(64, seed=1)))
+    second = upload(client, png_bytes(synthetic_fundus(64, seed=2)))
+    assert first["id"] != second["id"]
+    assert not second["duplicate"]
+
+
+def test_filters_served_from_result_cache(backend_app, client, monkeypatch):
+    calls = []
+    compute = backend_app.compute_filters
+
+    def counting_compute(*args, **kwargs):
+        calls.append(args[0])
+        return compute(*args, **kwargs)
+
+    monkeypatch.setattr(backend_app, "compute_filters", counting_compute)
+    image_id = upload(client, png_bytes(synthetic_fundus(96, seed=4)))["id"]
+    url = f"/api/filters/{image_id}?filters=Mean,CLAHE"
+    first = client.get(url)
+    # A re-upload of the same bytes shares the cached results
+    assert upload(client, png_bytes(synthetic_fundus(96, seed=4)))["id"] == image_id
+    second = client.get(url)
+    assert first.status_code == second.status_code == 200
+    assert first.get_json() == second.get_json()
+    assert [item["name"] for item in first.get_json()] == ["Mean", "CLAHE"]
+    assert calls == [image_id]
+
+    # Different options are a different cache entry
+    client.get(f"/api/filters/{image_id}?filters=Mean")
+    assert len(calls) == 2
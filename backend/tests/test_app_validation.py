@@ -0,0 +1,47 @@
+import pytest
+
+
+@pytest.mark.parametrize("query, message", [
+    ("filters=Mean,Sharpen", "Unknown filters: Sharpen"),
+    ("metrics=PSNR,LPIPS", "Unknown metrics: LPIPS"),
+    ("filters=,", "No filters selected"),
+    ("full_res=maybe", "full_res must be one of"),
+    ("full_res=2", "full_res must be one of"),
+    ("max_dim=big", "max_dim must be an integer"),
+    ("quality=0", "quality must be between"),
+    ("format=png", "Unsupported format: png"),
+])
+def test_bad_filter_options_are_rejected(client, image_id, query, message):
+    response = client.get(f"/api/filters/{image_id}?{query}")
+    assert response.status_code == 400
+    assert response.get_json()["error"].startswith(message)
+
+
+@pytest.mark.parametrize("value", ["1", "true", "Yes", "ON", "0", "false", "no", "off"])
+def test_full_res_accepts_boolean_spellings(backend_app, value):
+    expected = value.lower() in backend_app.TRUE_VALUES
+    assert backend_app.parse_filter_options({"full_res": value})["full_res"] is expected
+
+
+def test_names_are_deduplicated_in_registry_order(backend_app):
+    options = backend_app.parse_filter_options({"filters": "CLAHE, Mean,CLAHE", "metrics": "SSIM,PSNR"})
+    assert options["names"] == ("Mean", "CLAHE")
+    assert options["metrics"] == ("PSNR", "SSIM")
+
+
+def test_unknown_image_is_404(client):
+    response = client.get("/api/filters/missing.png?filters=Mean")
+    assert response.status_code == 404
+    assert response.get_json() == {"error": "Image not found"}
+
+
+@pytest.mark.parametrize("value", ["maybe", "2", ""])
+def test_bad_parallel_is_rejected(client, image_id, value):
+    response = client.get(f"/api/analyze/{image_id}?parallel={value}")
+    assert response.status_code == 400
+    assert response.get_json()["error"].startswith("parallel must be one of")
+
+    response = client.post("/api/jobs", json={"kind": "analyze", "image_id": image_id,
+                                              "params": {"parallel": value}})
+    assert response.status_code == 400
+    assert response.get_json()["error"].startswith("parallel must be one of")
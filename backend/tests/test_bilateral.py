@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+import filter_test
+from filter_stages import StageCache
+from skimage.metrics import structural_similarity as ssim
+from conftest import synthetic_fundus
+
+
+@pytest.fixture(scope="module")
+def large_fundus():
+    return synthetic_fundus(filter_test.BILATERAL_BOUND_MIN_DIM, seed=1)
+
+
+@pytest.mark.parametrize("scale", sorted(filter_test.BILATERAL_BOUNDS))
+def test_approximate_bilateral_within_bound(large_fundus, scale):
+    min_psnr, min_ssim = filter_test.BILATERAL_BOUNDS[scale]
+    exact = filter_test.filter_bilateral(large_fundus, scale=1)
+    approx = filter_test.filter_bilateral(large_fundus, scale=scale)
+    assert approx.shape == exact.shape and approx.dtype == np.uint8
+    mse = np.mean((exact.astype(np.float64) - approx) ** 2)
+    assert 20 * np.log10(255.0 / np.sqrt(mse)) >= min_psnr
+    assert ssim(exact, approx) >= min_ssim
+
+
+def test_ace_me_ignores_approximate_bilateral_stage(fundus):
+    # The Bilateral filter runs first on the bank's shared stage cache
+    stages = StageCache()
+    filter_test.filter_bilateral(fundus, stages, scale=2)
+    ace = filter_test.filter_ace_me_novel(fundus, stages)
+    reference = filter_test.filter_ace_me_reference(fundus)
+    assert np.abs(ace.astype(np.int16) - reference.astype(np.int16)).max() <= 1
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from conftest import synthetic_fundus
+from filter_batch import BatchStages, apply_filter_batch, compute_metrics_batch
+from filter_test import compute_metrics
+from filters import FILTERS, apply_filter
+
+
+@pytest.fixture(scope="module")
+def stack():
+    return np.stack([synthetic_fundus(96, seed=seed) for seed in range(3)])
+
+
+@pytest.mark.parametrize("name", list(FILTERS))
+def test_batch_matches_per_image(stack, name):
+    batch = apply_filter_batch(name, stack, BatchStages(len(stack)))
+    assert batch.shape == stack.shape
+    for img, out in zip(stack, batch):
+        np.testing.assert_array_equal(out, apply_filter(name, img))
+
+
+def test_lut_filters_honour_overridden_params(stack, monkeypatch):
+    spec = FILTERS["Median_Gamma"]
+    monkeypatch.setattr(spec, "params", {"ksize": 3, "gamma": 0.8})
+    batch = apply_filter_batch("Median_Gamma", stack)
+    for img, out in zip(stack, batch):
+        np.testing.assert_array_equal(out, spec(img))
+
+
+@pytest.mark.parametrize("step, tolerance", [(1, 1e-6), (2, 1e-3)])
+def test_batch_metrics_match_compute_metrics(stack, step, tolerance):
+    processed = apply_filter_batch("Unsharp_Mask", stack)
+    for original, out, computed in zip(stack, processed,
+                                       compute_metrics_batch(stack, processed, ssim_step=step)):
+        expected = compute_metrics(original, out)
+        assert list(computed) == list(expected)
+        for metric, value in expected.items():
+            allowed = tolerance if metric == "SSIM" else 1e-9 * max(1.0, abs(value))
+            assert computed[metric] == pytest.approx(value, abs=allowed), metric
@@ -0,0 +1,56 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import pytest
+import filters
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    # A GIL-holding filter to route; pools are restored afterwards
+    monkeypatch.setattr(filters.FILTERS["Homomorphic"], "releases_gil", False)
+    saved = filters.FILTER_THREADS, filters.FILTER_PROCESSES
+    yield filters.configure_pools
+    filters.configure_pools(*saved)
+
+
+def pool_types(names):
+    return {name: type(filters.pool_for(name)) for name in names}
+
+
+def test_process_pool_only_takes_gil_holding_filters(pools):
+    pools(1, 1)
+    assert pool_types(["Homomorphic", "Mean"]) == {"Homomorphic": ProcessPoolExecutor,
+                                                   "Mean": type(None)}
+    pools(4, 1)
+    assert pool_types(["Homomorphic", "Mean"]) == {"Homomorphic": ProcessPoolExecutor,
+                                                   "Mean": ThreadPoolExecutor}
+
+
+def test_without_process_pool_everything_uses_threads(pools):
+    pools(4, 0)
+    assert set(pool_types(filters.FILTERS).values()) == {ThreadPoolExecutor}
+    pools(1, 0)
+    assert set(pool_types(filters.FILTERS).values()) == {type(None)}
+
+
+def test_serial_and_pooled_filters_mix(fundus, monkeypatch):
+    names = ["Mean", "Median", "CLAHE", "Gaussian"]
+    with ThreadPoolExecutor(2) as pool:
+        monkeypatch.setattr(filters, "pool_for", lambda name: pool if name in ("Mean", "CLAHE") else None)
+        results = list(filters.iter_filters_parallel(fundus, names))
+    assert sorted(name for name, *_ in results) == sorted(names)
+    assert all(error is None for *_, error in results)
+    # The serial filters finish on the caller's thread, cheapest first
+    serial = [name for name, *_ in results if name in ("Median", "Gaussian")]
+    assert serial == filters.filters_by_cost(["Median", "Gaussian"])
+
+
+def test_fft_is_single_threaded_on_pool_threads(pools, monkeypatch):
+    import filter_test
+    import filter_tiles
+    monkeypatch.setattr(filter_test, "FFT_WORKERS", 0)
+    pools(2, 0)
+    assert filter_test.fft_workers() == -1
+    assert filters.pool_for("Ideal_LPF").submit(filter_test.fft_workers).result() == 1
+    assert filter_tiles._get_tile_pool().submit(filter_test.fft_workers).result() == 1
+    monkeypatch.setattr(filter_test, "FFT_WORKERS", 3)
+    assert filters.pool_for("Ideal_LPF").submit(filter_test.fft_workers).result() == 3
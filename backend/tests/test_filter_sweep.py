@@ -0,0 +1,53 @@
+import pytest
+from conftest import synthetic_fundus
+from filter_registry import FILTERS
+from filter_sweep import expand_grid, parse_metrics, parse_values, run_sweep
+from filter_test import compute_metrics
+
+
+def test_float_params_with_int_defaults_keep_fractions():
+    assert FILTERS["Gaussian"].params["sigma"] == 0
+    kind = FILTERS["Gaussian"].param_types["sigma"]
+    assert parse_values("0.5:2:0.5", kind) == [0.5, 1.0, 1.5, 2.0]
+    assert parse_values("0.5,1.5", kind) == [0.5, 1.5]
+    for name, param in (("Bilateral", "sigma_color"), ("Bilateral", "sigma_space"), ("Homomorphic", "c")):
+        assert FILTERS[name].param_types[param] is float
+
+
+def test_int_params():
+    kind = FILTERS["Mean"].param_types["ksize"]
+    assert parse_values("3,5,7,5", kind) == [3, 5, 7]
+    assert parse_values("10:30:10", kind) == [10, 20, 30]
+    with pytest.raises(ValueError):
+        parse_values("3.5", kind)
+
+
+def test_string_params():
+    kind = FILTERS["CLAHE_Wavelet"].param_types["denoiser"]
+    assert parse_values("haar, skimage,haar", kind) == ["haar", "skimage"]
+    assert expand_grid("CLAHE_Wavelet", {"denoiser": ["haar", "skimage"]}) == \
+        [{"denoiser": "haar"}, {"denoiser": "skimage"}]
+
+
+def test_unknown_param():
+    with pytest.raises(ValueError):
+        expand_grid("Mean", {"sigma": [1.0]})
+
+
+def test_parse_metrics():
+    assert parse_metrics("SSIM, PSNR,SSIM") == ("PSNR", "SSIM")
+    with pytest.raises(ValueError, match="Unknown metric LPIPS"):
+        parse_metrics("PSNR,LPIPS")
+    with pytest.raises(ValueError):
+        parse_metrics(",")
+
+
+def test_sweep_metrics_match_compute_metrics():
+    images = [(f"img{seed}", synthetic_fundus(64, seed=seed)) for seed in range(2)]
+    results = run_sweep("Median_Gamma", images, {"gamma": [0.8, 1.2]}, ("PSNR", "SSIM", "CII"), chunk=1)
+    assert len(results) == 4 and results["error"].isna().all()
+    for row in results.itertuples():
+        img = dict(images)[row.image]
+        expected = compute_metrics(img, FILTERS["Median_Gamma"](img, gamma=row.gamma), ("PSNR", "SSIM", "CII"))
+        for metric, value in expected.items():
+            assert getattr(row, metric) == pytest.approx(value, rel=1e-5)
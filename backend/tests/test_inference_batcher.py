@@ -0,0 +1,108 @@
+import threading
+import time
+import numpy as np
+import pytest
+from inference_batcher import MicroBatcher
+
+
+class BlockingPredict:
+    """
+    Stub predict_fn: doubles its input and records batch sizes. The first
+    call blocks until release(), so later submits queue up behind it.
+    """
+    def __init__(self, fail=False):
+        self.sizes = []
+        self.fail = fail
+        self.started = threading.Event()
+        self._release = threading.Event()
+
+    def release(self):
+        self._release.set()
+
+    def __call__(self, batch):
+        self.sizes.append(len(batch))
+        if len(self.sizes) == 1:
+            self.started.set()
+            self._release.wait(5)
+        if self.fail:
+            raise ValueError("model failed")
+        return batch * 2
+
+
+def _wait_for_queue(batcher, count):
+    deadline = time.monotonic() + 5
+    while batcher.stats()["queued"] < count and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+
+def test_queued_requests_share_one_batch():
+    predict = BlockingPredict()
+    batcher = MicroBatcher("test-batching", predict, max_batch_size=8, window_ms=50)
+    first = batcher.submit(np.full(3, 0.0))
+    predict.started.wait(5)
+    futures = [batcher.submit(np.full(3, float(i))) for i in range(1, 6)]
+    _wait_for_queue(batcher, 5)
+    predict.release()
+
+    assert np.array_equal(first.result(5), np.zeros(3))
+    for i, future in enumerate(futures, 1):
+        assert np.array_equal(future.result(5), np.full(3, 2.0 * i))
+    assert predict.sizes == [1, 5]
+    stats = batcher.stats()
+    assert stats["requests"] == 6 and stats["batches"] == 2 and stats["max_batch_seen"] == 5
+
+
+def test_batches_are_capped_at_max_batch_size():
+    predict = BlockingPredict()
+    batcher = MicroBatcher("test-cap", predict, max_batch_size=3, window_ms=50)
+    futures = [batcher.submit(np.array([0.0]))]
+    predict.started.wait(5)
+    futures += [batcher.submit(np.array([float(i)])) for i in range(1, 8)]
+    _wait_for_queue(batcher, 7)
+    predict.release()
+
+    assert [float(f.result(5)[0]) for f in futures] == [2.0 * i for i in range(8)]
+    assert predict.sizes == [1, 3, 3, 1]
+
+
+def test_partial_batch_is_flushed_after_the_window():
+    predict = BlockingPredict()
+    predict.release()
+    batcher = MicroBatcher("test-window", predict, max_batch_size=8, window_ms=30)
+    start = time.monotonic()
+    assert float(batcher.predict(np.array([1.5]))[0]) == 3.0
+    # One request never fills the batch: it runs once the window closes
+    assert time.monotonic() - start < 1.0
+    assert predict.sizes == [1]
+
+
+def test_exception_reaches_every_caller_of_the_batch():
+    predict = BlockingPredict(fail=True)
+    batcher = MicroBatcher("test-errors", predict, max_batch_size=8, window_ms=50)
+    futures = [batcher.submit(np.zeros(2))]
+    predict.started.wait(5)
+    futures += [batcher.submit(np.zeros(2)) for _ in range(3)]
+    _wait_for_queue(batcher, 3)
+    predict.release()
+
+    for future in futures:
+        with pytest.raises(ValueError, match="model failed"):
+            future.result(5)
+    # The worker keeps serving after a failed batch
+    predict.fail = False
+    assert np.array_equal(batcher.predict(np.ones(2)), np.full(2, 2.0))
+
+
+def test_cancelled_requests_are_skipped():
+    predict = BlockingPredict()
+    batcher = MicroBatcher("test-cancel", predict, max_batch_size=8, window_ms=50)
+    batcher.submit(np.zeros(1))
+    predict.started.wait(5)
+    cancelled = batcher.submit(np.zeros(1))
+    kept = batcher.submit(np.ones(1))
+    assert cancelled.cancel()
+    _wait_for_queue(batcher, 2)
+    predict.release()
+
+    assert float(kept.result(5)[0]) == 2.0
+    assert predict.sizes == [1, 1]
@@ -0,0 +1,55 @@
+import threading
+import time
+import pytest
+from jobs import JobQueue, QueueFull, JOB_OVERHEAD_BYTES, CANCELLED, FAILED, QUEUED, SUCCEEDED
+
+
+def wait_finished(queue, job, timeout=5):
+    deadline = time.time() + timeout
+    while job.status in (QUEUED, "running") and time.time() < deadline:
+        time.sleep(0.01)
+    return queue.get(job.id)
+
+
+def test_finished_results_are_bounded_by_bytes():
+    queue = JobQueue(1, 8, 3600, 5 * JOB_OVERHEAD_BYTES)
+    jobs = [queue.submit("x", lambda: "a" * JOB_OVERHEAD_BYTES) for _ in range(3)]
+    for job in jobs:
+        wait_finished(queue, job)
+    # Each job costs just over two overheads; only the newest two fit
+    assert queue.get(jobs[0].id) is None
+    assert [queue.get(job.id).result for job in jobs[1:]] == ["a" * JOB_OVERHEAD_BYTES] * 2
+    stats = queue.stats()
+    assert stats["evicted"] == 1
+    assert stats["results_bytes"] <= stats["results_budget_bytes"]
+
+
+def test_oversized_result_fails_the_job():
+    queue = JobQueue(1, 8, 3600, 4 * JOB_OVERHEAD_BYTES)
+    job = wait_finished(queue, queue.submit("x", lambda: "a" * 8 * JOB_OVERHEAD_BYTES))
+    assert job.status == FAILED
+    assert job.result is None
+
+
+def test_expired_jobs_are_pruned_on_get():
+    queue = JobQueue(1, 8, 0.05, 1 << 20)
+    job = wait_finished(queue, queue.submit("x", lambda: 1))
+    assert job.status == SUCCEEDED
+    time.sleep(0.1)
+    assert queue.get(job.id) is None
+    assert queue.stats()["jobs"] == {}
+
+
+def test_queued_job_cancels_immediately_and_frees_its_slot():
+    release = threading.Event()
+    queue = JobQueue(1, 2, 3600, 1 << 20)
+    running = queue.submit("x", lambda: release.wait(5))
+    queued = queue.submit("x", lambda: 1)
+    with pytest.raises(QueueFull):
+        queue.submit("x", lambda: 1)
+
+    assert queue.cancel(queued.id).status == CANCELLED
+    assert queue.get(queued.id).to_dict()["cancel_requested"] is True
+    queue.submit("x", lambda: 1)
+    release.set()
+    assert wait_finished(queue, running).status == SUCCEEDED
@@ -0,0 +1,70 @@
+import cv2
+import numpy as np
+import pytest
+import mask_generation
+from mask_generation import MASK_PARAMS, pseudo_mask, pseudo_masks, remove_small_components
+
+
+def _remove_small_components_loop(mask, min_area):
+    # The cleanup mask_generation used before: one full-image pass per label
+    num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    clean_mask = np.zeros_like(mask)
+    for i in range(1, num_labels):
+        if stats[i, cv2.CC_STAT_AREA] > min_area:
+            clean_mask[labels == i] = 255
+    return clean_mask
+
+
+def _pseudo_mask_reference(img, params):
+    # The original script's chain, step by step
+    img = cv2.resize(img, (params["size"], params["size"]))
+    clahe = cv2.createCLAHE(clipLimit=params["clip_limit"], tileGridSize=(params["tile_grid"],) * 2)
+    mask = cv2.adaptiveThreshold(clahe.apply(img), 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                 cv2.THRESH_BINARY_INV, params["block_size"], params["c"])
+    kernel = np.ones((params["open_kernel"],) * 2, np.uint8)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=1)
+    return _remove_small_components_loop(mask, params["min_area"])
+
+
+@pytest.mark.parametrize("min_area", [0, 30, 200])
+def test_remove_small_components_matches_loop(min_area):
+    # Blob field: thousands of components on both sides of min_area
+    noise = cv2.GaussianBlur(np.random.default_rng(0).normal(0, 1, (512, 512)), (0, 0), 1.5)
+    mask = ((noise > 0.05) * 255).astype(np.uint8)
+    assert np.array_equal(remove_small_components(mask, min_area),
+                          _remove_small_components_loop(mask, min_area))
+
+
+@pytest.mark.parametrize("overrides", [{}, {"open_kernel": 5, "min_area": 50}, {"size": 128}])
+def test_pseudo_mask_matches_original_chain(fundus, overrides):
+    params = {**MASK_PARAMS, **overrides}
+    mask = pseudo_mask(fundus, overrides)
+    assert mask.shape == (params["size"], params["size"]) and mask.dtype == np.uint8
+    assert np.array_equal(mask, _pseudo_mask_reference(fundus, params))
+
+
+def test_pseudo_masks_stack(fundus):
+    images = [fundus, fundus[::2, ::2], np.ascontiguousarray(fundus.T)]
+    stack = pseudo_masks(images)
+    assert stack.shape == (3, MASK_PARAMS["size"], MASK_PARAMS["size"])
+    for img, mask in zip(images, stack):
+        assert np.array_equal(mask, pseudo_mask(img))
+    assert pseudo_masks([]).shape == (0, MASK_PARAMS["size"], MASK_PARAMS["size"])
+
+
+def test_iter_mask_batches_skips_unreadable(tmp_path, fundus):
+    paths = []
+    for i in range(5):
+        path = str(tmp_path / f"{i}.png")
+        cv2.imwrite(path, np.roll(fundus, 10 * i, axis=1))
+        paths.append(path)
+    bad = tmp_path / "bad.png"
+    bad.write_text("not an image")
+    paths.insert(2, str(bad))
+
+    batches = list(mask_generation.iter_mask_batches(paths, batch_size=2))
+    assert [p for batch_paths, _, _ in batches for p in batch_paths] == [p for p in paths if p != str(bad)]
+    for batch_paths, images, masks in batches:
+        assert images.shape == masks.shape == (len(batch_paths), MASK_PARAMS["size"], MASK_PARAMS["size"])
+        for path, mask in zip(batch_paths, masks):
+            assert np.array_equal(mask, pseudo_mask(cv2.imread(path, cv2.IMREAD_GRAYSCALE)))
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+import filters
+from filter_test import METRIC_NAMES, ReferenceMetrics, compute_metrics
+
+# Absolute SSIM error against skimage by ssim_step (see filter_test)
+SSIM_TOLERANCE = {1: 1e-6, 2: 1e-3, 4: 5e-3}
+
+
+@pytest.fixture(scope="module")
+def candidates(fundus):
+    return {name: filters.apply_filter(name, fundus) for name in filters.FILTERS}
+
+
+def test_reference_metrics_match_compute_metrics(fundus, candidates):
+    reference = ReferenceMetrics(fundus, METRIC_NAMES, 1)
+    for name, processed in candidates.items():
+        expected = compute_metrics(fundus, processed)
+        computed = reference(processed)
+        assert list(computed) == list(expected), name
+        for metric, value in expected.items():
+            tolerance = SSIM_TOLERANCE[1] if metric == "SSIM" else 1e-9 * max(1.0, abs(value))
+            assert computed[metric] == pytest.approx(value, abs=tolerance), (name, metric)
+
+
+def test_stack_matches_per_image(fundus, candidates):
+    reference = ReferenceMetrics(fundus, METRIC_NAMES, 1)
+    stack = np.stack(list(candidates.values()))
+    for single, stacked in zip((reference(p) for p in stack), reference.evaluate_stack(stack)):
+        assert single == pytest.approx(stacked, rel=1e-12)
+
+
+@pytest.mark.parametrize("step", [2, 4])
+def test_strided_ssim_within_tolerance(fundus, candidates, step):
+    reference = ReferenceMetrics(fundus, ("SSIM",), step)
+    for name, processed in candidates.items():
+        expected = compute_metrics(fundus, processed, ("SSIM",))["SSIM"]
+        assert abs(reference(processed)["SSIM"] - expected) <= SSIM_TOLERANCE[step], name
+
+
+def test_metric_subset_and_constant_image(fundus):
+    reference = ReferenceMetrics(fundus, ("Entropy", "PSNR"))
+    assert list(reference(fundus)) == ["PSNR", "Entropy"]
+    flat = np.full_like(fundus, 90)
+    computed = ReferenceMetrics(flat)(flat)
+    assert computed["PSNR"] == 100 and computed["MSE"] == 0
+    assert computed["Entropy"] == 0 and not np.signbit(computed["Entropy"])
+    assert computed["CII"] == 0
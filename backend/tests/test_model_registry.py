@@ -0,0 +1,77 @@
+import threading
+import time
+import pytest
+from model_registry import ModelRegistry
+
+
+class FakeModel:
+    def __init__(self, params=10):
+        self.params = params
+
+    def count_params(self):
+        return self.params
+
+
+def test_hits_on_other_models_do_not_wait_for_a_cold_load():
+    registry = ModelRegistry(1 << 20)
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return FakeModel()
+
+    registry.register("slow", slow)
+    registry.register("fast", FakeModel)
+    registry.get("fast")
+
+    loader = threading.Thread(target=registry.get, args=("slow",))
+    loader.start()
+    started.wait(5)
+    start = time.perf_counter()
+    assert registry.get("fast") is not None
+    assert time.perf_counter() - start < 1
+    release.set()
+    loader.join()
+
+
+def test_concurrent_cold_requests_load_once():
+    registry = ModelRegistry(1 << 20)
+    calls = []
+
+    def load():
+        calls.append(1)
+        time.sleep(0.2)
+        return FakeModel()
+
+    registry.register("m", load)
+    threads = [threading.Thread(target=registry.get, args=("m",)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert registry.stats()["loads"] == 1
+
+
+def test_failed_load_is_remembered_until_retry():
+    registry = ModelRegistry(1 << 20, retry_s=0.2)
+    calls = []
+    registry.register("missing", lambda: calls.append(1))
+    for _ in range(3):
+        assert registry.get("missing") is None
+    assert len(calls) == 1
+    time.sleep(0.25)
+    assert registry.get("missing") is None
+    assert len(calls) == 2
+
+
+def test_unknown_model_and_eviction():
+    registry = ModelRegistry(100)
+    registry.register("a", lambda: FakeModel(15))
+    registry.register("b", lambda: FakeModel(15))
+    with pytest.raises(KeyError):
+        registry.get("c")
+    registry.get("a")
+    registry.get("b")
+    assert list(registry.stats()["resident"]) == ["b"]
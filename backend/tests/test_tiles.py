@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+import filter_tiles
+from conftest import synthetic_fundus
+from filters import FILTERS, apply_filter
+from filter_test import compute_metrics
+
+TILE = 128
+TILED = [name for name, spec in FILTERS.items() if spec.halo is not None]
+
+
+@pytest.fixture(scope="module")
+def large():
+    # Not a multiple of the tile size, so edge tiles are partial
+    return synthetic_fundus(300, seed=2)[:300, :290]
+
+
+@pytest.mark.parametrize("name", TILED)
+def test_tiled_filter_matches_whole_image(large, name):
+    assert filter_tiles.is_tiled(name, large, TILE)
+    np.testing.assert_array_equal(filter_tiles.apply_filter_tiled(name, large, tile_size=TILE),
+                                  apply_filter(name, large))
+
+
+def test_untiled_filters_fall_back_to_whole_image(large):
+    name = next(name for name, spec in FILTERS.items() if spec.halo is None)
+    assert not filter_tiles.is_tiled(name, large, TILE)
+    np.testing.assert_array_equal(filter_tiles.apply_filter_tiled(name, large, tile_size=TILE),
+                                  apply_filter(name, large))
+
+
+@pytest.mark.parametrize("name", ["Gaussian", "CLAHE"])
+def test_tiled_metrics_match_whole_image(large, name):
+    processed = apply_filter(name, large)
+    tiled = filter_tiles.tiled_metrics(large, processed, tile_size=TILE)
+    whole = compute_metrics(large, processed)
+    assert tiled.keys() == whole.keys()
+    for metric, value in whole.items():
+        assert tiled[metric] == pytest.approx(value, rel=1e-6, abs=1e-9), metric
+
+
+def test_tiled_metrics_subset(large):
+    processed = apply_filter("Mean", large)
+    tiled = filter_tiles.tiled_metrics(large, processed, ("SSIM", "Entropy"), tile_size=TILE)
+    whole = compute_metrics(large, processed, ("SSIM", "Entropy"))
+    assert tiled == pytest.approx(whole, rel=1e-6)
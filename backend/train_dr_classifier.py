@@ -4,7 +4,6 @@ import numpy as np
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Conv2D, MaxPooling2D, Flatten, Dense, Dropout
-from tensorflow.keras.utils import to_categorical
 from tensorflow.keras.optimizers import Adam
 from sklearn.model_selection import train_test_split
 
@@ -24,64 +23,120 @@ def bce_loss(y_true, y_pred):
 combined_loss = lambda y_true, y_pred: bce_loss(y_true, y_pred) + dice_loss(y_true, y_pred)
 
 IMG_SIZE = 224
+BATCH_SIZE = 8
 DATASET = "dataset"  # Directory where DR folders are located
 MASK_DIR = os.path.join("dataset", "dataset", "masks")  # Path to pre-generated masks
 
 classes = ["No_DR", "Mild_DR", "Severe_DR"]
 label_map = {c:i for i,c in enumerate(classes)}
 
-X, y = [], []
-
-for cls in classes:
-    folder = os.path.join(DATASET, cls)
-    print(f"Checking folder: {folder}")
-    if not os.path.exists(folder):
-        print(f"Folder {folder} does not exist")
-        continue
-    files = os.listdir(folder)
-    print(f"Found {len(files)} files in {cls}")
-    for img_name in files:
-        img_path = os.path.join(folder, img_name)
-        img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
-        if img is None:
+# ----------------------------
+# STREAMING INPUT PIPELINE
+# ----------------------------
+# Only file paths and labels are held in memory. Images are decoded and
+# resized in parallel as batches are requested, so peak memory is a few
+# batches whatever the dataset size. Splits are stratified by class over
+# the path lists.
+
+def list_dataset(dataset_dir=DATASET):
+    """
+    (paths, labels) of every file in the class folders of dataset_dir.
+    """
+    paths, labels = [], []
+    for cls in classes:
+        folder = os.path.join(dataset_dir, cls)
+        print(f"Checking folder: {folder}")
+        if not os.path.exists(folder):
+            print(f"Folder {folder} does not exist")
             continue
-
-        img = cv2.resize(img, (IMG_SIZE, IMG_SIZE))
-
-        # 🔥 USE IMAGE ONLY (no mask)
-        combined = (img/255.0)[..., np.newaxis]
-
-        X.append(combined)
-        y.append(label_map[cls])
-
-print(f"Total samples loaded: {len(X)}")
-
-X = np.array(X)
-y = to_categorical(y, num_classes=3)
-
-X_train, X_test, y_train, y_test = train_test_split(X,y,test_size=0.2)
+        files = sorted(f for f in os.listdir(folder) if os.path.isfile(os.path.join(folder, f)))
+        print(f"Found {len(files)} files in {cls}")
+        paths.extend(os.path.join(folder, f) for f in files)
+        labels.extend([label_map[cls]] * len(files))
+    return paths, labels
+
+def _read_image(path):
+    # Same preprocessing as classification.preprocess; unreadable files are
+    # flagged and dropped from the stream
+    img = cv2.imread(path.decode("utf-8"), cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        return np.zeros((IMG_SIZE, IMG_SIZE, 1), np.float32), False
+
+    img = cv2.resize(img, (IMG_SIZE, IMG_SIZE))
+
+    # 🔥 USE IMAGE ONLY (no mask)
+    return (img.astype(np.float32) / 255.0)[..., np.newaxis], True
+
+def _load_example(path, label):
+    img, ok = tf.numpy_function(_read_image, [path], [tf.float32, tf.bool])
+    img.set_shape((IMG_SIZE, IMG_SIZE, 1))
+    ok.set_shape(())
+    return img, tf.one_hot(label, len(classes)), ok
+
+def _is_readable(img, label, ok):
+    return ok
+
+def _drop_flag(img, label, ok):
+    return img, label
+
+def make_dataset(paths, labels, batch_size=BATCH_SIZE, shuffle=False):
+    """
+    tf.data pipeline of (image, one-hot label) batches read from paths.
+    shuffle reshuffles the paths every epoch.
+    """
+    ds = tf.data.Dataset.from_tensor_slices((list(paths), list(labels)))
+    if shuffle:
+        ds = ds.shuffle(len(paths), reshuffle_each_iteration=True)
+    ds = ds.map(_load_example, num_parallel_calls=tf.data.AUTOTUNE, deterministic=not shuffle)
+    ds = ds.filter(_is_readable).map(_drop_flag)
+    return ds.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+def stratified_split(paths, labels, test_size):
+    """
+    Class-stratified split of parallel path and label lists.
+    Returns (paths_a, paths_b, labels_a, labels_b).
+    """
+    return train_test_split(paths, labels, test_size=test_size, stratify=labels)
 
 # ----------------------------
 # CNN MODEL
 # ----------------------------
-model = Sequential([
-    Conv2D(32,(3,3),activation='relu',input_shape=(224,224,1)),
-    MaxPooling2D(2,2),
-    Conv2D(64,(3,3),activation='relu'),
-    MaxPooling2D(2,2),
-    Flatten(),
-    Dense(128,activation='relu'),
-    Dropout(0.5),
-    Dense(3,activation='softmax')
-])
-
-model.compile(
-    optimizer=Adam(0.0001),
-    loss='categorical_crossentropy',
-    metrics=['accuracy']
-)
-
-model.fit(X_train,y_train,epochs=15,batch_size=8,validation_split=0.1)
-
-model.save("dr_classifier.h5")
-print("✅ DR Classification Model Saved")
+def build_model():
+    model = Sequential([
+        Conv2D(32,(3,3),activation='relu',input_shape=(224,224,1)),
+        MaxPooling2D(2,2),
+        Conv2D(64,(3,3),activation='relu'),
+        MaxPooling2D(2,2),
+        Flatten(),
+        Dense(128,activation='relu'),
+        Dropout(0.5),
+        Dense(3,activation='softmax')
+    ])
+
+    model.compile(
+        optimizer=Adam(0.0001),
+        loss='categorical_crossentropy',
+        metrics=['accuracy']
+    )
+    return model
+
+def main():
+    paths, labels = list_dataset(DATASET)
+    print(f"Total samples listed: {len(paths)}")
+
+    # 20% held out for testing, 10% of the rest for validation
+    train_paths, test_paths, train_labels, test_labels = stratified_split(paths, labels, 0.2)
+    train_paths, val_paths, train_labels, val_labels = stratified_split(train_paths, train_labels, 0.1)
+    print(f"Train: {len(train_paths)}, validation: {len(val_paths)}, test: {len(test_paths)}")
+
+    train_ds = make_dataset(train_paths, train_labels, shuffle=True)
+    val_ds = make_dataset(val_paths, val_labels)
+
+    model = build_model()
+    model.fit(train_ds,epochs=15,validation_data=val_ds)
+
+    model.save("dr_classifier.h5")
+    print("✅ DR Classification Model Saved")
+
+if __name__ == "__main__":
+    main()